@@ -0,0 +1,166 @@
+"""AstrBot 最小桩：仅覆盖插件核心路径用到的 API，基准测试无需安装 AstrBot
+
+构造函数签名与属性名与 AstrBot 保持一致，分析器可原样运行。
+"""
+
+import enum
+import logging
+import sys
+import types
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class EventType(enum.Enum):
+    OnAstrBotLoadedEvent = enum.auto()
+    OnPlatformLoadedEvent = enum.auto()
+    AdapterMessageEvent = enum.auto()
+    OnLLMRequestEvent = enum.auto()
+    OnLLMResponseEvent = enum.auto()
+    OnDecoratingResultEvent = enum.auto()
+    OnCallingFuncToolEvent = enum.auto()
+    OnAfterMessageSentEvent = enum.auto()
+
+
+@dataclass
+class StarHandlerMetadata:
+    event_type: EventType
+    handler_full_name: str
+    handler_name: str
+    handler_module_path: str
+    handler: Any
+    event_filters: list = field(default_factory=list)
+    desc: str = ""
+    extras_configs: dict = field(default_factory=dict)
+
+
+class CommandFilter:
+    def __init__(self, command_name: str, alias=None, handler_md=None):
+        self.command_name = command_name
+        self.alias = alias or set()
+        self.handler_md = handler_md
+
+
+class CommandGroupFilter:
+    def __init__(self, group_name: str, alias=None, parent_group=None):
+        self.group_name = group_name
+        self.alias = alias or set()
+        self.parent_group = parent_group
+        self.sub_command_filters: list = []
+
+    def add_sub_command_filter(self, sub):
+        self.sub_command_filters.append(sub)
+
+
+class RegexFilter:
+    def __init__(self, regex: str):
+        self.regex_str = regex
+
+
+class EventMessageType(enum.Flag):
+    GROUP_MESSAGE = enum.auto()
+    PRIVATE_MESSAGE = enum.auto()
+    OTHER_MESSAGE = enum.auto()
+    ALL = GROUP_MESSAGE | PRIVATE_MESSAGE | OTHER_MESSAGE
+
+
+class EventMessageTypeFilter:
+    def __init__(self, event_message_type: EventMessageType):
+        self.event_message_type = event_message_type
+
+
+class PlatformAdapterType(enum.Flag):
+    AIOCQHTTP = enum.auto()
+    TELEGRAM = enum.auto()
+    DISCORD = enum.auto()
+    ALL = AIOCQHTTP | TELEGRAM | DISCORD
+
+
+class PlatformAdapterTypeFilter:
+    def __init__(self, platform_adapter_type: PlatformAdapterType):
+        self.platform_type = platform_adapter_type
+
+
+class PermissionType(enum.Enum):
+    ADMIN = "admin"
+    MEMBER = "member"
+
+
+class PermissionTypeFilter:
+    def __init__(self, permission_type: PermissionType, raise_error: bool = True):
+        self.permission_type = permission_type
+        self.raise_error = raise_error
+
+
+class FunctionTool:
+    def __init__(self, name: str, description: str, handler_module_path: str | None):
+        self.name = name
+        self.description = description
+        self.handler_module_path = handler_module_path
+        self.active = True
+
+
+class MCPTool(FunctionTool):
+    def __init__(self, name: str, description: str, mcp_server_name: str):
+        super().__init__(name, description, None)
+        self.mcp_server_name = mcp_server_name
+
+
+class Context:
+    """AstrBot Context 桩：插件列表、全局配置与 LLM 工具管理器"""
+
+    def __init__(self, stars: list, tools: list, wake_prefix: list[str]):
+        self._stars = stars
+        self._tool_manager = types.SimpleNamespace(func_list=tools)
+        self._config = {"wake_prefix": wake_prefix}
+
+    def get_all_stars(self) -> list:
+        return self._stars
+
+    def get_config(self) -> dict:
+        return self._config
+
+    def get_llm_tool_manager(self):
+        return self._tool_manager
+
+
+star_handlers_registry: list[StarHandlerMetadata] = []
+
+
+def install():
+    """把桩模块注册进 sys.modules (覆盖已安装的 AstrBot)"""
+
+    def mod(name: str, **attrs):
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+    filter_pkg = "astrbot.core.star.filter"
+    mod("astrbot")
+    mod("astrbot.api", AstrBotConfig=dict, logger=logging.getLogger("astrbot"))
+    mod("astrbot.api.star", Context=Context)
+    mod("astrbot.core")
+    mod("astrbot.core.agent")
+    mod("astrbot.core.agent.mcp_client", MCPTool=MCPTool)
+    mod("astrbot.core.star")
+    mod(filter_pkg)
+    mod(f"{filter_pkg}.command", CommandFilter=CommandFilter)
+    mod(f"{filter_pkg}.command_group", CommandGroupFilter=CommandGroupFilter)
+    mod(
+        f"{filter_pkg}.event_message_type",
+        EventMessageType=EventMessageType,
+        EventMessageTypeFilter=EventMessageTypeFilter,
+    )
+    mod(f"{filter_pkg}.permission", PermissionTypeFilter=PermissionTypeFilter)
+    mod(
+        f"{filter_pkg}.platform_adapter_type",
+        PlatformAdapterType=PlatformAdapterType,
+        PlatformAdapterTypeFilter=PlatformAdapterTypeFilter,
+    )
+    mod(f"{filter_pkg}.regex", RegexFilter=RegexFilter)
+    mod(
+        "astrbot.core.star.star_handler",
+        EventType=EventType,
+        StarHandlerMetadata=StarHandlerMetadata,
+        star_handlers_registry=star_handlers_registry,
+    )
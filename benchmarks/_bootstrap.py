@@ -0,0 +1,81 @@
+"""基准测试引导：把插件目录注册为包，使相对导入可用
+
+未安装 AstrBot 时自动换用 _astrbot_stub 桩。
+"""
+
+import importlib
+import json
+import sys
+import types
+from pathlib import Path
+from typing import Any
+
+import _astrbot_stub
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "astrbot_plugin_help_typst"
+TEMPLATE_PATH = PLUGIN_DIR / "templates" / "base.typ"
+FONT_DIR = PLUGIN_DIR / "resources" / "fonts"
+
+
+def load_module(name: str) -> types.ModuleType:
+    """加载插件子模块，如 load_module("core.worker")"""
+    if "astrbot" not in sys.modules:
+        try:
+            importlib.import_module("astrbot.api")
+        except ImportError:
+            _astrbot_stub.install()
+    if PACKAGE_NAME not in sys.modules:
+        pkg = types.ModuleType(PACKAGE_NAME)
+        pkg.__path__ = [str(PLUGIN_DIR)]
+        sys.modules[PACKAGE_NAME] = pkg
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+def default_config():
+    """按 _conf_schema.json 的默认值构造 PluginConfig"""
+
+    def defaults(schema: dict[str, Any]) -> dict[str, Any]:
+        return {
+            k: defaults(v["items"]) if v.get("type") == "object" else v.get("default")
+            for k, v in schema.items()
+        }
+
+    schema = json.loads((PLUGIN_DIR / "_conf_schema.json").read_text(encoding="utf-8"))
+    return load_module("utils.config").PluginConfig.load(defaults(schema))
+
+
+def synthetic_payload(mode: str, plugins: int, nodes: int = 6) -> dict[str, Any]:
+    """构造与 TypstLayout 输出结构一致的布局数据"""
+
+    def node(i: int, j: int) -> dict[str, Any]:
+        return {
+            "name": f"cmd_{i}_{j}",
+            "desc": f"第 {j} 个指令的描述" if j % 2 else "",
+            "is_group": False,
+            "tag": "event_listener" if mode != "command" else "normal",
+            "priority": 0 if mode != "command" else None,
+            "children": [],
+        }
+
+    def plugin(i: int) -> dict[str, Any]:
+        return {
+            "name": f"plugin_{i}",
+            "display_name": f"插件 {i}" if i % 2 else None,
+            "version": "v1.0.0",
+            "desc": "",
+            "nodes": [node(i, j) for j in range(nodes)],
+        }
+
+    cards = [plugin(i) for i in range(plugins)]
+    giants = cards[:2] if mode != "command" else []
+    rest = cards[len(giants) :]
+    return {
+        "title": f"Benchmark ({mode})",
+        "mode": mode,
+        "prefixes": ["/"],
+        "plugin_count": plugins,
+        "giants": giants,
+        "columns": [rest[0::3], rest[1::3], rest[2::3]],
+        "singles": [],
+    }
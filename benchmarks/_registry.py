@@ -0,0 +1,138 @@
+"""合成插件注册表：按给定规模填充 AstrBot 桩的 star_handlers_registry"""
+
+import types
+from dataclasses import dataclass
+
+import _astrbot_stub as stub
+
+
+@dataclass
+class RegistrySpec:
+    plugins: int = 60
+    commands: int = 4  # 每个插件的独立指令数
+    groups: int = 1  # 每个插件的顶级指令组数
+    group_depth: int = 2  # 指令组嵌套层数
+    group_width: int = 3  # 每层指令组的子指令数
+    regex: int = 1  # 每个插件的正则监听数
+    listeners: int = 2  # 每个插件的其他事件监听数
+    plugin_tools: int = 1  # 每个插件注册的函数工具数
+    mcp_tools: int = 10  # MCP 工具总数
+
+
+_LISTENER_EVENTS = [
+    stub.EventType.OnLLMRequestEvent,
+    stub.EventType.OnLLMResponseEvent,
+    stub.EventType.OnDecoratingResultEvent,
+    stub.EventType.OnAfterMessageSentEvent,
+    stub.EventType.OnAstrBotLoadedEvent,
+]
+
+
+def _noop():
+    """占位 handler"""
+
+
+def build_registry(spec: RegistrySpec) -> stub.Context:
+    """生成注册表并返回对应的 Context 桩"""
+    registry = stub.star_handlers_registry
+    registry.clear()
+    stars, tools = [], []
+
+    def add_handler(module: str, name: str, event_type, filters, desc="", **extras):
+        md = stub.StarHandlerMetadata(
+            event_type=event_type,
+            handler_full_name=f"{module}_{name}",
+            handler_name=name,
+            handler_module_path=module,
+            handler=_noop,
+            event_filters=filters,
+            desc=desc,
+            extras_configs=extras,
+        )
+        registry.append(md)
+        return md
+
+    def add_group(module: str, name: str, depth: int, parent=None):
+        group = stub.CommandGroupFilter(name, parent_group=parent)
+        add_handler(
+            module,
+            f"grp_{name}",
+            stub.EventType.AdapterMessageEvent,
+            [group],
+            desc=f"{name} 指令组",
+        )
+        for k in range(spec.group_width):
+            sub_name = f"{name}_{k}"
+            cmd = stub.CommandFilter(sub_name)
+            cmd.handler_md = add_handler(
+                module,
+                f"sub_{sub_name}",
+                stub.EventType.AdapterMessageEvent,
+                [cmd],
+                desc=f"子指令 {k}" if k % 2 else "",
+            )
+            group.add_sub_command_filter(cmd)
+        if depth > 1:
+            group.add_sub_command_filter(add_group(module, f"{name}s", depth - 1, group))
+        return group
+
+    for i in range(spec.plugins):
+        module = f"data.plugins.bench_plugin_{i}.main"
+        stars.append(
+            types.SimpleNamespace(
+                name=f"bench_plugin_{i}",
+                root_dir_name=f"bench_plugin_{i}",
+                module_path=module,
+                display_name=f"基准插件 {i}" if i % 3 == 0 else None,
+                version="v1.0.0",
+                desc=f"第 {i} 个合成插件",
+                activated=True,
+            )
+        )
+
+        for j in range(spec.commands):
+            filters = [stub.CommandFilter(f"cmd{i}_{j}")]
+            if j % 4 == 3:
+                filters.append(stub.PermissionTypeFilter(stub.PermissionType.ADMIN))
+            add_handler(
+                module,
+                f"cmd_{j}",
+                stub.EventType.AdapterMessageEvent,
+                filters,
+                desc=f"指令 {j} 的说明\n第二行不会显示" if j % 2 else "",
+            )
+
+        for g in range(spec.groups):
+            add_group(module, f"g{i}_{g}", spec.group_depth)
+
+        for r in range(spec.regex):
+            add_handler(
+                module,
+                f"re_{r}",
+                stub.EventType.AdapterMessageEvent,
+                [
+                    stub.RegexFilter(rf"^(?:ping|pong){i}_{r}\s*(.*)$"),
+                    stub.EventMessageTypeFilter(stub.EventMessageType.GROUP_MESSAGE),
+                    stub.PlatformAdapterTypeFilter(stub.PlatformAdapterType.AIOCQHTTP),
+                ],
+                desc="正则监听",
+                priority=r,
+            )
+
+        for e in range(spec.listeners):
+            add_handler(
+                module,
+                f"on_{e}",
+                _LISTENER_EVENTS[(i + e) % len(_LISTENER_EVENTS)],
+                [],
+                desc=f"事件监听 {e}",
+                priority=e,
+            )
+
+        for t in range(spec.plugin_tools):
+            tools.append(stub.FunctionTool(f"tool_{i}_{t}", "插件提供的函数工具", module))
+
+    for t in range(spec.mcp_tools):
+        tools.append(stub.MCPTool(f"mcp_tool_{t}", "MCP 服务提供的工具", f"server{t % 3}"))
+
+    return stub.Context(stars, tools, wake_prefix=["/"])
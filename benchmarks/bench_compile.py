@@ -0,0 +1,67 @@
+"""常驻编译器基准：冷编译 vs 同一 worker 内第 2..N 次编译
+
+用法:
+    python benchmarks/bench_compile.py --plugins 60 --renders 5 --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from _bootstrap import FONT_DIR, TEMPLATE_PATH, load_module, synthetic_payload
+
+
+def _compile_series(mode: str, plugins: int, renders: int, out_dir: str) -> list[float]:
+    """在一个全新子进程中连续编译同一模式，返回每次 Typst 编译耗时"""
+    worker = load_module("core.worker")
+    sys_inputs = {
+        "json_string": json.dumps(synthetic_payload(mode, plugins), ensure_ascii=False),
+        "timestamp": "benchmark",
+    }
+
+    timings = []
+    for i in range(renders):
+        start = time.perf_counter()
+        worker.compile_template(
+            str(TEMPLATE_PATH),
+            [str(FONT_DIR)],
+            sys_inputs,
+            output=f"{out_dir}/bench_{mode}_{i}.png",
+            ppi=144.0,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plugins", type=int, default=60)
+    parser.add_argument("--renders", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for mode in ("command", "event", "filter"):
+        cold, warm = [], []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as out_dir:
+                # 每轮使用全新进程，首次渲染即为冷编译
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    series = pool.submit(
+                        _compile_series, mode, args.plugins, args.renders, out_dir
+                    ).result()
+            cold.append(series[0])
+            warm.extend(series[1:])
+
+        warm_mean = statistics.mean(warm) if warm else float("nan")
+        print(
+            f"{mode:<8} cold={statistics.mean(cold) * 1000:8.1f}ms  "
+            f"warm(2..N)={warm_mean * 1000:8.1f}ms  "
+            f"speedup={statistics.mean(cold) / warm_mean:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
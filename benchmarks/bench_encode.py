@@ -0,0 +1,81 @@
+"""WebP 编码基准：三种菜单模式下不同编码参数的耗时与体积，以及分片串行/并行对比
+
+用法:
+    python benchmarks/bench_encode.py --plugins 150 --split-height 4000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from _bootstrap import FONT_DIR, TEMPLATE_PATH, load_module, synthetic_payload
+
+# (名称, quality, method, lossless)
+PROFILES = [
+    ("q80 m6", 80, 6, False),
+    ("q80 m4", 80, 4, False),
+    ("q80 m2", 80, 2, False),
+    ("q90 m4", 90, 4, False),
+    ("lossless m0", 50, 0, True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plugins", type=int, default=150)
+    parser.add_argument("--split-height", type=int, default=4000)
+    parser.add_argument("--ppi", type=float, default=144.0)
+    args = parser.parse_args()
+
+    worker = load_module("core.worker")
+    image = load_module("utils.image")
+    cpus = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("command", "event", "filter"):
+            png = Path(tmp) / f"{mode}.png"
+            worker.compile_template(
+                str(TEMPLATE_PATH),
+                [str(FONT_DIR)],
+                {
+                    "json_string": json.dumps(
+                        synthetic_payload(mode, args.plugins), ensure_ascii=False
+                    ),
+                    "timestamp": "benchmark",
+                },
+                output=str(png),
+                ppi=args.ppi,
+            )
+            print(f"\n[{mode}] PNG {png.stat().st_size / 1024:.0f} KiB")
+
+            for name, quality, method, lossless in PROFILES:
+                row = []
+                for workers in (1, cpus):
+                    out_dir = Path(tmp) / f"{mode}_{workers}"
+                    out_dir.mkdir(exist_ok=True)
+                    start = time.perf_counter()
+                    files = image.process_image_to_webp(
+                        source=str(png),
+                        output_dir=str(out_dir),
+                        stem_name="bench",
+                        webp_limit=0,  # 强制切分
+                        split_height=args.split_height,
+                        quality=quality,
+                        method=method,
+                        lossless=lossless,
+                        workers=workers,
+                    )
+                    row.append(time.perf_counter() - start)
+                size = sum(Path(f).stat().st_size for f in files)
+                print(
+                    f"  {name:<12} chunks={len(files):<3} size={size / 1024:8.0f} KiB  "
+                    f"serial={row[0] * 1000:7.0f}ms  "
+                    f"parallel({cpus})={row[1] * 1000:7.0f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""节点模型基准：Pydantic 模型 (RenderNode / PluginMetadata) vs 轻量节点 (LiteNode / LitePlugin)
+
+按分析器的形状构造插件树 (独立指令 + 嵌套指令组)，分别测量
+每个节点的构造耗时与序列化 (→ dict，即布局 JSON 的输入) 耗时。
+
+用法:
+    python benchmarks/bench_nodes.py --plugins 150 --commands 8 --group-depth 3
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+from _bootstrap import load_module
+
+
+def build_tree(node_cls, plugin_cls, args) -> tuple[list[Any], int]:
+    """返回 (插件列表, 节点总数)"""
+    count = 0
+
+    def group(name: str, depth: int):
+        nonlocal count
+        children = [
+            node_cls(name=f"{name}_{k}", desc=f"子指令 {k}" if k % 2 else "", tag="normal")
+            for k in range(args.group_width)
+        ]
+        count += args.group_width
+        if depth > 1:
+            children.append(group(f"{name}s", depth - 1))
+        count += 1
+        return node_cls(name=name, desc="指令组", is_group=True, tag="normal", children=children)
+
+    plugins = []
+    for i in range(args.plugins):
+        nodes = [
+            node_cls(
+                name=f"cmd{i}_{j}",
+                desc=f"指令 {j} 的说明" if j % 2 else "",
+                tag="admin" if j % 4 == 3 else "normal",
+            )
+            for j in range(args.commands)
+        ]
+        count += args.commands
+        nodes += [group(f"g{i}_{g}", args.group_depth) for g in range(args.groups)]
+        plugins.append(
+            plugin_cls(
+                name=f"bench_plugin_{i}",
+                display_name=f"基准插件 {i}" if i % 3 == 0 else None,
+                version="v1.0.0",
+                desc=f"第 {i} 个合成插件",
+                nodes=nodes,
+            )
+        )
+    return plugins, count
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> tuple[Any, float]:
+    """返回 (最后一次结果, 中位耗时秒)"""
+    result, timings = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plugins", type=int, default=150)
+    parser.add_argument("--commands", type=int, default=6)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--group-depth", type=int, default=2)
+    parser.add_argument("--group-width", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    schemas = load_module("domain.schemas")
+    models = {
+        "pydantic": (
+            schemas.RenderNode,
+            schemas.PluginMetadata,
+            lambda p: p.model_dump(),
+        ),
+        "lite": (schemas.LiteNode, schemas.LitePlugin, lambda p: p.to_dict()),
+    }
+
+    dumps = {}
+    for label, (node_cls, plugin_cls, to_dict) in models.items():
+        (plugins, count), build = timed(
+            lambda: build_tree(node_cls, plugin_cls, args), args.repeat
+        )
+        dicts, serialize = timed(lambda: [to_dict(p) for p in plugins], args.repeat)
+        text, encode = timed(
+            lambda: json.dumps(dicts, ensure_ascii=False, separators=(",", ":")),
+            args.repeat,
+        )
+        dumps[label] = text
+        print(
+            f"{label:<9} {count} nodes  "
+            f"build={build / count * 1e9:7.0f}ns/node  "
+            f"serialize={serialize / count * 1e9:7.0f}ns/node  "
+            f"json={encode * 1000:6.1f}ms  "
+            f"total={(build + serialize + encode) * 1000:7.1f}ms"
+        )
+
+    # 两种模型产出的布局数据必须一致
+    assert dumps["pydantic"] == dumps["lite"], "序列化结果不一致"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""分阶段全流程基准：合成注册表 → 分析 → 布局 → 渲染 (编译 + 编码) → 单独编码
+
+每个阶段重复多次，报告首次 / 中位 / 最快耗时；另以 tracemalloc 单独跑一次，
+报告 Python 堆峰值 (Typst 与 Pillow 的原生内存不在统计内，末尾给出进程 RSS 峰值)。
+注册表使用 AstrBot 桩，与是否安装 AstrBot 无关。
+
+用法:
+    python benchmarks/bench_pipeline.py --plugins 200 --group-depth 3 --mcp-tools 30
+"""
+
+import argparse
+import logging
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import fields
+from typing import Any
+
+import _astrbot_stub
+
+# 合成注册表依赖桩类型，必须在加载插件模块之前注册
+_astrbot_stub.install()
+
+from _bootstrap import FONT_DIR, TEMPLATE_PATH, default_config, load_module  # noqa: E402
+from _registry import RegistrySpec, build_registry  # noqa: E402
+
+MODES = {
+    "command": ("CommandAnalyzer", "AstrBot 指令菜单"),
+    "event": ("EventAnalyzer", "AstrBot 事件监听"),
+    "filter": ("FilterAnalyzer", "AstrBot 过滤器分析"),
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> tuple[Any, list[float], int]:
+    """返回 (最后一次结果, 各次耗时, Python 堆峰值字节)"""
+    result, timings = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    # 追踪本身有开销，峰值单独测一次，不计入耗时
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, timings, peak
+
+
+def report(mode: str, stage: str, timings: list[float], peak: int):
+    print(
+        f"{mode:<8} {stage:<10} "
+        f"first={timings[0] * 1000:9.1f}ms  "
+        f"median={statistics.median(timings) * 1000:9.1f}ms  "
+        f"min={min(timings) * 1000:9.1f}ms  "
+        f"py_peak={peak / 1024 / 1024:8.2f}MiB"
+    )
+
+
+def peak_rss_mib() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Linux 单位为 KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    for f in fields(RegistrySpec):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=int, default=f.default)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    logging.getLogger("astrbot").setLevel(logging.WARNING)
+    spec = RegistrySpec(**{f.name: getattr(args, f.name) for f in fields(RegistrySpec)})
+    context = build_registry(spec)
+    print(
+        f"registry: {spec.plugins} plugins, "
+        f"{len(_astrbot_stub.star_handlers_registry)} handlers, "
+        f"{len(context.get_llm_tool_manager().func_list)} tools"
+    )
+
+    core = load_module("core")
+    utils = load_module("utils")
+    cfg = default_config()
+    layout = utils.TypstLayout(cfg)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for mode in args.modes:
+            analyzer_name, title = MODES[mode]
+            analyzer = getattr(core, analyzer_name)(context, cfg)
+
+            plugins, timings, peak = measure(analyzer.analyze_hierarchy, args.repeat)
+            report(mode, "analyze", timings, peak)
+
+            json_str, timings, peak = measure(
+                lambda: layout.dumps_layout(plugins, title, mode, ["/"]), args.repeat
+            )
+            report(mode, "layout", timings, peak)
+
+            task = core.RenderTask(
+                template_path=str(TEMPLATE_PATH),
+                font_paths=[str(FONT_DIR)],
+                json_str=json_str,
+                output_dir=out_dir,
+                stem_name=f"bench_{mode}",
+                timestamp="benchmark",
+                query=None,
+                is_temp=False,
+                req_id="bench",
+                webp_limit=cfg.webp_limit,
+                split_height=cfg.split_height,
+                ppi=cfg.ppi,
+                webp_quality=cfg.webp_quality,
+                webp_method=cfg.webp_method,
+                webp_lossless=cfg.webp_lossless,
+                page_height=cfg.split_height * 72 / cfg.ppi if cfg.paginate else None,
+            )
+
+            def render():
+                output = core.execute_render_task(task)
+                if output.error:
+                    raise RuntimeError(output.error)
+                return output.images
+
+            images, timings, peak = measure(render, args.repeat)
+            report(mode, "render", timings, peak)
+
+            # 编码阶段单独计时：先编译出 PNG 字节 (不计时)
+            png = core.worker.compile_template(
+                task.template_path,
+                task.font_paths,
+                {"json_string": json_str, "timestamp": "benchmark"},
+                ppi=cfg.ppi,
+            )
+            png = png[0] if isinstance(png, list) else png
+            _, timings, peak = measure(
+                lambda: utils.process_image_to_webp(
+                    source=png,
+                    output_dir=out_dir,
+                    stem_name=f"bench_{mode}_encode",
+                    webp_limit=cfg.webp_limit,
+                    split_height=cfg.split_height,
+                    quality=cfg.webp_quality,
+                    method=cfg.webp_method,
+                    lossless=cfg.webp_lossless,
+                ),
+                args.repeat,
+            )
+            report(mode, "encode", timings, peak)
+            print(
+                f"{'':<8} {len(plugins)} cards, layout {len(json_str) / 1024:.1f} KiB, "
+                f"{len(images)} image(s)"
+            )
+            if mode in layout.column_stats:
+                before, after = layout.column_stats[mode]
+                print(
+                    f"{'':<8} {cfg.column_count} columns, max column {after:.0f}pt "
+                    f"(LPT {before:.0f}pt, estimated heights)"
+                )
+
+    rss = peak_rss_mib()
+    if rss is not None:
+        print(f"peak RSS: {rss:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,57 @@
-from .analyzer import BaseAnalyzer, CommandAnalyzer, EventAnalyzer, FilterAnalyzer
+from .analyzer import (
+    BaseAnalyzer,
+    CommandAnalyzer,
+    EventAnalyzer,
+    FilterAnalyzer,
+    registry_fingerprint,
+)
+from .cache import CacheManifest, FragmentCache, SearchCache
+from .metrics import RenderMetrics, record_stage
+from .registry import RegistrySnapshot, RegistrySnapshots
 from .renderer import RenderResult, TypstRenderer
-from .worker import RenderTask, execute_render_task, force_memory_release
+from .search import SearchIndex
+from .store import FileSystemStore, RedisStore, RenderStore, create_store
+from .warmer import MenuWarmer
+from .worker import (
+    FragmentPlan,
+    RenderOutput,
+    RenderTask,
+    compile_shard,
+    execute_fragment_task,
+    execute_render_task,
+    execute_stitch_task,
+    force_memory_release,
+    warmup_worker,
+)
 
 __all__ = [
     "force_memory_release",
     "execute_render_task",
+    "execute_stitch_task",
+    "compile_shard",
+    "execute_fragment_task",
+    "warmup_worker",
     "RenderTask",
+    "FragmentPlan",
+    "RenderOutput",
     "BaseAnalyzer",
     "CommandAnalyzer",
     "EventAnalyzer",
     "FilterAnalyzer",
+    "registry_fingerprint",
+    "RegistrySnapshot",
+    "RegistrySnapshots",
     "TypstRenderer",
     "RenderResult",
+    "RenderMetrics",
+    "record_stage",
+    "SearchCache",
+    "FragmentCache",
+    "CacheManifest",
+    "SearchIndex",
+    "RenderStore",
+    "FileSystemStore",
+    "RedisStore",
+    "create_store",
+    "MenuWarmer",
 ]
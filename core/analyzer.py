@@ -22,168 +22,176 @@ from astrbot.core.star.star_handler import (
     star_handlers_registry,
 )
 
-from ..domain import InternalCFG, PluginMetadata, RenderNode
-from ..utils import PluginConfig
+from ..domain import InternalCFG, LiteNode, LitePlugin, lite_text
+from ..utils import PluginConfig, calculate_hash
+from .registry import HandlerEntry, RegistrySnapshot, RegistrySnapshots
+from .search import SearchIndex
+
+
+def _filter_signature(f: Any) -> tuple:
+    """Filter 中会被渲染的内容
+
+    指令组只取直属子项的名称：子指令 / 子指令组的详情由其自身 handler 的 Filter 覆盖
+    """
+    if isinstance(f, CommandGroupFilter):
+        return (
+            "group",
+            f.group_name,
+            sorted(f.alias) if f.alias else (),
+            [
+                getattr(sub, "group_name", None) or getattr(sub, "command_name", None)
+                for sub in f.sub_command_filters
+            ],
+        )
+    if isinstance(f, CommandFilter):
+        return ("command", f.command_name, sorted(f.alias) if f.alias else ())
+    if isinstance(f, RegexFilter):
+        return ("regex", f.regex_str)
+    if isinstance(f, PermissionTypeFilter):
+        return ("permission", f.permission_type.value)
+    if isinstance(f, PlatformAdapterTypeFilter):
+        return ("platform", f.platform_type.value)
+    if isinstance(f, EventMessageTypeFilter):
+        return ("message_type", f.event_message_type.value)
+    return (type(f).__name__,)
+
+
+def _handler_signature(h: StarHandlerMetadata) -> tuple:
+    """Handler 中会被渲染的内容 (描述 / 事件类型 / 优先级 / Filter)
+
+    枚举取 value：Enum.__repr__ 为纯 Python 实现，大注册表上明显拖慢 repr
+    """
+    func = getattr(h, "handler", None)
+    return (
+        h.handler_full_name,
+        h.handler_module_path,
+        h.handler_name,
+        h.event_type.value,
+        h.desc,
+        getattr(func, "__doc__", None),
+        (getattr(h, "extras_configs", None) or {}).get("priority", 0),
+        [_filter_signature(f) for f in getattr(h, "event_filters", None) or ()],
+    )
+
+
+def registry_fingerprint(
+    context: Context, config: PluginConfig, prefixes: list[str]
+) -> str:
+    """注册表指纹：覆盖所有影响分析结果的输入，远比完整分析廉价
+
+    只取会被渲染的内容，不依赖对象 id (插件重载后内存地址可能被复用)
+    """
+    handlers = [
+        _handler_signature(h)
+        for h in star_handlers_registry
+        if isinstance(h, StarHandlerMetadata)
+    ]
+    stars = [
+        (
+            getattr(s, "name", None),
+            getattr(s, "module_path", None),
+            getattr(s, "activated", None),
+            getattr(s, "version", None),
+            getattr(s, "display_name", None),
+            getattr(s, "desc", None),
+        )
+        for s in context.get_all_stars()
+    ]
+
+    tools = []
+    tool_manager = None
+    if hasattr(context, "get_llm_tool_manager"):
+        tool_manager = context.get_llm_tool_manager()
+    if tool_manager:
+        tools = [
+            (
+                t.name,
+                t.active,
+                getattr(t, "handler_module_path", None),
+                getattr(t, "mcp_server_name", None),
+                t.description,
+            )
+            for t in tool_manager.func_list
+        ]
+
+    raw = repr((handlers, stars, tools, list(config.ignored_plugins), list(prefixes)))
+    return calculate_hash(raw)
 
 
 class BaseAnalyzer:
-    def __init__(self, context: Context, config: PluginConfig):
+    def __init__(
+        self,
+        context: Context,
+        config: PluginConfig,
+        snapshots: RegistrySnapshots | None = None,
+    ):
         self.context = context
         self.cfg = config
-
-    def get_plugins(self, query: str | None = None) -> list[PluginMetadata]:
+        # 注册表快照 (多个分析器共用同一实例时，每个指纹只扫描一次注册表)
+        self.snapshots = snapshots or RegistrySnapshots(context, config)
+        # 分析结果记忆化: (指纹, 结果)
+        self._memo: tuple[str, list[LitePlugin]] | None = None
+        self._index: SearchIndex | None = None
+
+    def get_plugins(
+        self, query: str | None = None, fingerprint: str | None = None
+    ) -> list[LitePlugin]:
         """获取（经过搜索过滤的）插件列表"""
         try:
-            # 1. 获取全量数据
-            structured_plugins = self.analyze_hierarchy()
+            # 1. 获取全量数据 (指纹未变则复用上次分析结果)
+            if fingerprint and self._memo and self._memo[0] == fingerprint:
+                structured_plugins = self._memo[1]
+            else:
+                structured_plugins = self.analyze_hierarchy(
+                    self.snapshots.get(fingerprint)
+                )
+                if fingerprint:
+                    self._memo = (fingerprint, structured_plugins)
 
             # 2. 非搜索 → 返回
             if not query:
                 return structured_plugins
 
-            # 3. 搜索 → 过滤
-            q_lower = query.lower()
-            filtered_plugins = []
-
-            for p in structured_plugins:
-                p_copy = p.model_copy(deep=True)
-                # 检查插件(容器)本身是否匹配: 在Command模式下，p是插件；在Event/Filter模式下，p是分类组(如 OnMessage)
-                is_container_match = self._is_match(
-                    p_copy.name, p_copy.display_name, p_copy.desc, q_lower
-                )
-
-                if is_container_match:
-                    # 容器匹配 -> 保留整个容器及其所有内容
-                    filtered_plugins.append(p_copy)
-                else:
-                    # 容器不匹配 -> 深入内部进行剪枝(过滤 nodes 列表，只保留匹配的子节点)
-                    matched_nodes = self._filter_nodes_recursively(
-                        p_copy.nodes, q_lower
-                    )
-
-                    if matched_nodes:
-                        # 保留有剩余节点的容器
-                        p_copy.nodes = matched_nodes
-                        filtered_plugins.append(p_copy)
-
-            return filtered_plugins
+            # 3. 搜索 → 索引查询 (每次分析只建一次索引)
+            # 在Command模式下，容器是插件；在Event/Filter模式下，容器是分类组(如 OnMessage)
+            if self._index is None or self._index.plugins is not structured_plugins:
+                self._index = SearchIndex(structured_plugins)
+            return self._index.search(query)
 
         except Exception as e:
             logger.error(f"[HelpTypst] 分析失败: {e}", exc_info=True)
             return []
 
-    def _is_match(self, name: str, display: str | None, desc: str, query: str) -> bool:
-        """基础匹配检查"""
-        if query in name.lower():
-            return True
-        if display and query in display.lower():
-            return True
-        if desc and query in desc.lower():
-            return True
-        return False
-
-    def _filter_nodes_recursively(
-        self, nodes: list[RenderNode], query: str
-    ) -> list[RenderNode]:
-        """递归过滤节点树，返回一个新的包含匹配的节点的节点列表"""
-        result = []
-        for node in nodes:
-            # 1. 检查自身匹配
-            self_match = self._is_match(node.name, None, node.desc, query)
-
-            # 2. 递归检查子节点
-            if self_match:
-                # 若节点本身匹配，保留上下文
-                result.append(node)
-            else:
-                # 节点本身不匹配，检查子节点
-                if node.children:
-                    filtered_children = self._filter_nodes_recursively(
-                        node.children, query
-                    )
-                    if filtered_children:
-                        # 有子节点存活时，保留过滤后的当前节点
-                        node.children = filtered_children
-                        result.append(node)
-        return result
+    def analyze_hierarchy(
+        self, snapshot: RegistrySnapshot | None = None
+    ) -> list[LitePlugin]:
+        """全量分析 (未传入快照时现场扫描注册表)"""
+        return self._analyze(snapshot or self.snapshots.get())
 
-    def analyze_hierarchy(self) -> list[PluginMetadata]:
+    def _analyze(self, snap: RegistrySnapshot) -> list[LitePlugin]:
         raise NotImplementedError
 
-    def _group_handlers_by_module(self) -> dict[str, list[StarHandlerMetadata]]:
-        mapping = defaultdict(list)
-        for handler in star_handlers_registry:
-            if isinstance(handler, StarHandlerMetadata) and handler.handler_module_path:
-                mapping[handler.handler_module_path].append(handler)
-        return mapping
-
-    def _get_safe_plugin_info(self, star_meta: Any) -> dict[str, str | None]:
-        """针对不规范的插件元信息进行防御性编程"""
-        if not star_meta:
-            return {"name": "Unknown", "display_name": None, "version": "", "desc": ""}
-
-        # 智能名称
-        raw_name = getattr(
-            star_meta, "name", None
-        )  # 标准插件名 (metadata.yaml 或 @register)
-        raw_root_dir = getattr(star_meta, "root_dir_name", None)  # 目录名
-        raw_module = getattr(star_meta, "module_path", None)  # 模块路径
-
-        # 决策树
-        if raw_name:
-            safe_name = str(raw_name)
-        elif raw_root_dir:
-            safe_name = str(raw_root_dir)
-        elif raw_module:
-            parts = str(raw_module).split(".")
-            safe_name = (
-                parts[-2] if len(parts) > 2 and parts[-1] == "main" else parts[-1]
-            )
-        else:
-            safe_name = f"Unknown_{id(star_meta)}"  # 正常不应走到这，因为无标识符插件根本加载不了
-
-        # 其他字段
-        display = getattr(star_meta, "display_name", None)
-        if not display:
-            display = None
-
-        version = str(getattr(star_meta, "version", "")) or ""
-        desc = str(getattr(star_meta, "desc", "")) or ""
-
-        return {
-            "name": safe_name,
-            "display_name": display,
-            "version": version,
-            "desc": desc,
-            "raw_module": raw_module,  # handler 查找
-        }
-
 
 class CommandAnalyzer(BaseAnalyzer):
     """指令分析器：处理 CommandFilter / CommandGroupFilter"""
 
-    def analyze_hierarchy(self) -> list[PluginMetadata]:
-        handlers_map = self._group_handlers_by_module()
+    def _analyze(self, snap: RegistrySnapshot) -> list[LitePlugin]:
         results = []
-        all_stars = self.context.get_all_stars()
 
         logger.info(
-            f"[HelpTypst] 开始分析指令。共扫描到 {len(all_stars)} 个已加载插件。"
+            f"[HelpTypst] 开始分析指令。共扫描到 {len(snap.plugins)} 个已加载插件。"
         )
 
-        for star_meta in all_stars:
-            if not star_meta.activated:
+        for plugin in snap.plugins:
+            # 未激活 / 黑名单
+            if not plugin.visible:
                 continue
 
-            info = self._get_safe_plugin_info(star_meta)
+            info = plugin.info
             safe_name = info["name"]
             raw_module = info["raw_module"]
             plugin_name = safe_name or "未知插件"
 
-            # 黑名单
-            if safe_name in self.cfg.ignored_plugins:
-                continue
-
             # 模块路径
             if not raw_module:
                 logger.debug(
@@ -191,15 +199,8 @@ class CommandAnalyzer(BaseAnalyzer):
                 )
                 continue
 
-            # --- Handler 关联 ---
-            handlers = handlers_map.get(raw_module, [])
-
-            # Fallback: 模糊匹配
-            if not handlers:
-                for k, v in handlers_map.items():
-                    if k.startswith(raw_module) or raw_module.startswith(k):
-                        handlers = v
-                        break
+            # --- Handler 关联 (精确 → 最长祖先前缀 → 子树) ---
+            handlers = snap.modules.resolve(raw_module)
 
             if not handlers:
                 # 防御性跳过 + 提供调试
@@ -210,10 +211,10 @@ class CommandAnalyzer(BaseAnalyzer):
 
             # --- 构建指令树 ---
             try:
-                nodes = self._build_plugin_command_tree(handlers)
+                nodes = self._build_plugin_command_tree(snap, handlers)
                 if nodes:
                     results.append(
-                        PluginMetadata(
+                        LitePlugin(
                             name=plugin_name,
                             display_name=info["display_name"],
                             version=info["version"],
@@ -234,20 +235,20 @@ class CommandAnalyzer(BaseAnalyzer):
         return results
 
     def _build_plugin_command_tree(
-        self, handlers: list[StarHandlerMetadata]
-    ) -> list[RenderNode]:
+        self, snap: RegistrySnapshot, handlers: list[HandlerEntry]
+    ) -> list[LiteNode]:
         nodes = []
         # 黑名单扫描：防止子组重复出现在顶层
         child_handlers_blacklist = self._scan_all_children(handlers)
 
         # 1. 顶级组
-        for handler in handlers:
+        for entry in handlers:
+            handler = entry.handler
             if handler.handler_name in child_handlers_blacklist:
                 continue
-            group_filter = self._get_filter(handler, CommandGroupFilter)
-            if isinstance(group_filter, CommandGroupFilter):
+            if entry.group is not None:
                 try:
-                    node = self._parse_group(handler, group_filter)
+                    node = self._parse_group(snap, entry)
                     if node:
                         nodes.append(node)
                 except Exception as e:
@@ -256,15 +257,15 @@ class CommandAnalyzer(BaseAnalyzer):
                     )
 
         # 2. 独立指令
-        for handler in handlers:
+        for entry in handlers:
+            handler = entry.handler
             if handler.handler_name in child_handlers_blacklist:
                 continue
-            if self._get_filter(handler, CommandGroupFilter):
+            if entry.group is not None:
                 continue
-            cmd_filter = self._get_filter(handler, CommandFilter)
-            if isinstance(cmd_filter, CommandFilter):
+            if entry.command is not None:
                 try:
-                    node = self._parse_command_node(handler, cmd_filter)
+                    node = self._parse_command_node(entry)
                     if node:
                         nodes.append(node)
                 except Exception as e:
@@ -275,13 +276,12 @@ class CommandAnalyzer(BaseAnalyzer):
         self._sort_nodes(nodes)
         return nodes
 
-    def _scan_all_children(self, handlers: list[StarHandlerMetadata]) -> set[str]:
+    def _scan_all_children(self, handlers: list[HandlerEntry]) -> set[str]:
         blacklist = set()
         groups_map = {}
-        for h in handlers:
-            gf = self._get_filter(h, CommandGroupFilter)
-            if isinstance(gf, CommandGroupFilter):
-                groups_map[gf.group_name] = h.handler_name
+        for entry in handlers:
+            if entry.group is not None:
+                groups_map[entry.group.group_name] = entry.handler.handler_name
 
         def _scan_recursive(filter_obj):
             h_md = getattr(filter_obj, "handler_md", None)
@@ -296,52 +296,56 @@ class CommandAnalyzer(BaseAnalyzer):
                 for sub in filter_obj.sub_command_filters:
                     _scan_recursive(sub)
 
-        for h in handlers:
-            gf = self._get_filter(h, CommandGroupFilter)
-            if isinstance(gf, CommandGroupFilter):
-                for sub in gf.sub_command_filters:
+        for entry in handlers:
+            if entry.group is not None:
+                for sub in entry.group.sub_command_filters:
                     _scan_recursive(sub)
         return blacklist
 
-    def _parse_group(
-        self, handler: StarHandlerMetadata, group_filter: CommandGroupFilter
-    ) -> RenderNode:
-        desc = (handler.desc or "").split("\n")[0].strip()
+    def _parse_group(self, snap: RegistrySnapshot, entry: HandlerEntry) -> LiteNode:
+        group_filter = entry.group
+        desc = (entry.handler.desc or "").split("\n")[0].strip()
         children = []
         for sub_filter in group_filter.sub_command_filters:
-            child = self._process_sub_filter(sub_filter)
+            child = self._process_sub_filter(snap, sub_filter)
             if child:
                 children.append(child)
 
         self._sort_nodes(children)
-        return RenderNode(
-            name=group_filter.group_name,
+        return LiteNode(
+            name=lite_text(group_filter.group_name, "Unknown"),
             desc=desc or "指令组",
             is_group=True,
-            tag=self._check_permission(handler),
+            tag="admin" if entry.is_admin else "normal",
             children=children,
         )
 
-    def _process_sub_filter(self, filter_obj: Any) -> RenderNode | None:
+    def _process_sub_filter(
+        self, snap: RegistrySnapshot, filter_obj: Any
+    ) -> LiteNode | None:
         handler = getattr(filter_obj, "handler_md", None)
         desc = self._get_desc_safely(handler)
-        tag = self._check_permission(handler) if handler else "normal"
+        entry = snap.entry_of(handler)
+        tag = "admin" if entry and entry.is_admin else "normal"
 
         if isinstance(filter_obj, CommandFilter):
-            return RenderNode(
-                name=filter_obj.command_name, desc=desc, is_group=False, tag=tag
+            return LiteNode(
+                name=lite_text(filter_obj.command_name, "Unknown"),
+                desc=desc,
+                is_group=False,
+                tag=tag,
             )
 
         elif isinstance(filter_obj, CommandGroupFilter):
             children = []
             if hasattr(filter_obj, "sub_command_filters"):
                 for sf in filter_obj.sub_command_filters:
-                    child = self._process_sub_filter(sf)
+                    child = self._process_sub_filter(snap, sf)
                     if child:
                         children.append(child)
             self._sort_nodes(children)
-            return RenderNode(
-                name=filter_obj.group_name,
+            return LiteNode(
+                name=lite_text(filter_obj.group_name, "Unknown"),
                 desc=desc or "子指令组",
                 is_group=True,
                 tag=tag,
@@ -349,36 +353,18 @@ class CommandAnalyzer(BaseAnalyzer):
             )
         return None
 
-    def _parse_command_node(
-        self, handler: StarHandlerMetadata, cmd_filter: CommandFilter
-    ) -> RenderNode:
-        desc = (handler.desc or "").split("\n")[0].strip()
-        return RenderNode(
-            name=cmd_filter.command_name,
+    def _parse_command_node(self, entry: HandlerEntry) -> LiteNode:
+        desc = (entry.handler.desc or "").split("\n")[0].strip()
+        return LiteNode(
+            name=lite_text(entry.command.command_name, "Unknown"),
             desc=desc,
             is_group=False,
-            tag=self._check_permission(handler),
+            tag="admin" if entry.is_admin else "normal",
         )
 
-    def _sort_nodes(self, nodes: list[RenderNode]):
+    def _sort_nodes(self, nodes: list[LiteNode]):
         nodes.sort(key=lambda x: (x.is_group, x.name))
 
-    def _check_permission(self, handler: Any) -> str:
-        if not handler or not hasattr(handler, "event_filters"):
-            return "normal"
-        for f in handler.event_filters:
-            if isinstance(f, PermissionTypeFilter):
-                return "admin"
-        return "normal"
-
-    def _get_filter(self, handler: StarHandlerMetadata, filter_type):
-        if not hasattr(handler, "event_filters"):
-            return None
-        for f in handler.event_filters:
-            if isinstance(f, filter_type):
-                return f
-        return None
-
     def _get_desc_safely(self, handler: Any) -> str:
         if not handler:
             return ""
@@ -389,83 +375,69 @@ class CommandAnalyzer(BaseAnalyzer):
 class EventAnalyzer(BaseAnalyzer):
     """事件分析器：处理所有 EventType，获取完整工具列表（含 MCP）"""
 
-    def analyze_hierarchy(self) -> list[PluginMetadata]:
+    def _analyze(self, snap: RegistrySnapshot) -> list[LitePlugin]:
         results = []
 
-        # 1. 映射模块路径到插件对象
-        module_to_plugin = {}
-        all_stars = self.context.get_all_stars()
-        for star in all_stars:
-            if star.module_path:
-                module_to_plugin[star.module_path] = star
-
         # --- A.处理函数工具 (Plugin Tools + MCP Tools) ---
-        # 获取工具列表
-        tool_manager = None
-        if hasattr(self.context, "get_llm_tool_manager"):
-            tool_manager = self.context.get_llm_tool_manager()
-
-        if tool_manager:
-            for tool in tool_manager.func_list:
-                if not tool.active:
-                    continue
-
-                source_name = "Unknown"
-                source_display = None
-                source_version = ""  # 默认为空，MCP 无版本号
-                tag = "tool"
-
-                # >>> 来源: MCP <<<
-                if MCPTool and isinstance(tool, MCPTool):
-                    source_name = f"MCP/{tool.mcp_server_name}"
-                    source_display = f"🔌 {tool.mcp_server_name}"
-                    tag = "mcp"
-                elif tool.handler_module_path:
-                    # >>> 来源: 插件 <<<
-                    plugin = module_to_plugin.get(tool.handler_module_path)
-                    if plugin:
-                        if plugin.name in self.cfg.ignored_plugins:
-                            continue
-                        source_name = plugin.name
-                        source_display = getattr(plugin, "display_name", None)
-                        source_version = getattr(plugin, "version", "")
-                    else:
-                        source_name = "Core/Unknown"
+        for tool in snap.tools:
+            if not tool.active:
+                continue
 
-                desc = (tool.description or "").split("\n")[0].strip()
+            source_name = "Unknown"
+            source_display = None
+            source_version = ""  # 默认为空，MCP 无版本号
+            tag = "tool"
+
+            # >>> 来源: MCP <<<
+            if MCPTool and isinstance(tool, MCPTool):
+                source_name = f"MCP/{tool.mcp_server_name}"
+                source_display = f"🔌 {tool.mcp_server_name}"
+                tag = "mcp"
+            elif tool.handler_module_path:
+                # >>> 来源: 插件 <<<
+                entry = snap.by_module.get(tool.handler_module_path)
+                if entry:
+                    plugin = entry.star
+                    if plugin.name in self.cfg.ignored_plugins:
+                        continue
+                    source_name = plugin.name
+                    source_display = getattr(plugin, "display_name", None)
+                    source_version = lite_text(getattr(plugin, "version", ""))
+                else:
+                    source_name = "Core/Unknown"
 
-                node = RenderNode(name=tool.name, desc=desc, is_group=False, tag=tag)
+            desc = (tool.description or "").split("\n")[0].strip()
 
-                # 包装为 PluginMetadata
-                pm = PluginMetadata(
-                    name=source_name,
-                    display_name=source_display,
-                    version=source_version,
-                    desc="",
-                    nodes=[node],
-                )
-                results.append(pm)
+            node = LiteNode(
+                name=lite_text(tool.name, "Unknown"),
+                desc=desc,
+                is_group=False,
+                tag=tag,
+            )
+
+            # 包装为 LitePlugin
+            pm = LitePlugin(
+                name=source_name,
+                display_name=source_display,
+                version=source_version,
+                desc="",
+                nodes=[node],
+            )
+            results.append(pm)
 
         # --- B.处理普通事件 (排除 OnCallingFuncToolEvent)  ---
         event_groups = defaultdict(list)
 
-        for handler in star_handlers_registry:
-            if not isinstance(handler, StarHandlerMetadata):
-                continue
-
-            if self._is_command_handler(handler):
+        for entry in snap.handlers:
+            handler = entry.handler
+            if entry.is_command:
                 continue
             if handler.event_type == EventType.OnCallingFuncToolEvent:
                 continue
 
-            if handler.handler_module_path in module_to_plugin:
-                plugin = module_to_plugin[handler.handler_module_path]
-                info = self._get_safe_plugin_info(plugin)
-                if info["name"] in self.cfg.ignored_plugins:
-                    continue  # 黑名单
-                if not plugin.activated:
-                    continue
-            else:
+            # 未关联插件 / 未激活 / 黑名单
+            plugin = snap.by_module.get(handler.handler_module_path)
+            if not plugin or not plugin.visible:
                 continue
 
             event_groups[handler.event_type].append(handler)
@@ -475,12 +447,7 @@ class EventAnalyzer(BaseAnalyzer):
 
             nodes = []
             for h in handlers:
-                plugin = module_to_plugin.get(h.handler_module_path)
-                p_info = (
-                    self._get_safe_plugin_info(plugin)
-                    if plugin
-                    else {"name": "System", "display_name": None}
-                )
+                p_info = snap.by_module[h.handler_module_path].info
 
                 # 构造节点
                 p_name = p_info["name"]
@@ -503,7 +470,7 @@ class EventAnalyzer(BaseAnalyzer):
 
                 prio = h.extras_configs.get("priority", 0)
                 nodes.append(
-                    RenderNode(
+                    LiteNode(
                         name=main_name,
                         desc=full_desc,
                         is_group=False,
@@ -517,7 +484,7 @@ class EventAnalyzer(BaseAnalyzer):
                 key=lambda x: x.priority if x.priority is not None else 0, reverse=True
             )
 
-            pm = PluginMetadata(
+            pm = LitePlugin(
                 name="event_group",
                 display_name=card_title,
                 version="",
@@ -528,74 +495,41 @@ class EventAnalyzer(BaseAnalyzer):
 
         return results
 
-    def _is_command_handler(self, handler: StarHandlerMetadata) -> bool:
-        if not handler.event_filters:
-            return False
-        for f in handler.event_filters:
-            if isinstance(f, CommandFilter | CommandGroupFilter):
-                return True
-        return False
-
 
 class FilterAnalyzer(BaseAnalyzer):
     """过滤器分析器"""
 
-    def analyze_hierarchy(self) -> list[PluginMetadata]:
+    def _analyze(self, snap: RegistrySnapshot) -> list[LitePlugin]:
         results = []
-        module_to_plugin = {}
-        all_stars = self.context.get_all_stars()
-        for star in all_stars:
-            if star.module_path:
-                module_to_plugin[star.module_path] = star
 
         # 数据容器
         regex_data = defaultdict(list)
         platform_data = defaultdict(list)
         msgtype_data = defaultdict(list)
 
-        for handler in star_handlers_registry:
-            if not isinstance(handler, StarHandlerMetadata):
-                continue
-
-            # 关联插件对象
-            if handler.handler_module_path in module_to_plugin:
-                plugin = module_to_plugin[handler.handler_module_path]
-                p_info = self._get_safe_plugin_info(plugin)
-                if p_info["name"] in self.cfg.ignored_plugins:
-                    continue  # 黑名单
-                if not plugin.activated:
-                    continue
-            else:
-                continue
+        for entry in snap.handlers:
+            handler = entry.handler
 
-            if not handler.event_filters:
+            # 关联插件对象 (未关联 / 未激活 / 黑名单 跳过)
+            plugin = snap.by_module.get(handler.handler_module_path)
+            if not plugin or not plugin.visible:
                 continue
 
-            # 分类收集 Filter
-            for f in handler.event_filters:
-                if isinstance(f, RegexFilter):
-                    regex_data[handler.handler_module_path].append(
-                        (f.regex_str, handler)
-                    )
-                elif isinstance(f, PlatformAdapterTypeFilter):
-                    names = self._format_flags(f.platform_type, PlatformAdapterType)
-                    key = f"🌍 {names}"
-                    platform_data[key].append(handler)
-                elif isinstance(f, EventMessageTypeFilter):
-                    names = self._format_flags(f.event_message_type, EventMessageType)
-                    key = f"📨 {names}"
-                    msgtype_data[key].append(handler)
+            # 分类收集 Filter (快照中已按类型分拣)
+            for regex_str in entry.regexes:
+                regex_data[handler.handler_module_path].append((regex_str, handler))
+            for f in entry.platforms:
+                names = self._format_flags(f.platform_type, PlatformAdapterType)
+                platform_data[f"🌍 {names}"].append(handler)
+            for f in entry.msg_types:
+                names = self._format_flags(f.event_message_type, EventMessageType)
+                msgtype_data[f"📨 {names}"].append(handler)
 
         # --- 1. Regex 卡片 按插件分组 ---
         if regex_data:
             nodes = []
             for mod_path, items in regex_data.items():
-                plugin = module_to_plugin.get(mod_path)
-                p_info = (
-                    self._get_safe_plugin_info(plugin)
-                    if plugin
-                    else self._get_safe_plugin_info(None)
-                )
+                p_info = snap.info_of(mod_path)
                 p_name = p_info["name"]
                 p_display = p_info["display_name"]
 
@@ -613,8 +547,8 @@ class FilterAnalyzer(BaseAnalyzer):
                         full_desc += f" · {raw_desc}"
 
                     children.append(
-                        RenderNode(
-                            name=r_str,
+                        LiteNode(
+                            name=lite_text(r_str, "Unknown"),
                             desc=full_desc,
                             is_group=False,
                             tag="regex_pattern",
@@ -625,7 +559,7 @@ class FilterAnalyzer(BaseAnalyzer):
                 container_name = p_display or p_name or "未知父节点"
 
                 nodes.append(
-                    RenderNode(
+                    LiteNode(
                         name=container_name,
                         desc=container_desc,
                         is_group=True,
@@ -637,7 +571,7 @@ class FilterAnalyzer(BaseAnalyzer):
             nodes.sort(key=lambda x: x.name)
 
             results.append(
-                PluginMetadata(
+                LitePlugin(
                     name="filter_regex",
                     display_name="正则触发器 (Regex)",
                     version="",
@@ -650,7 +584,7 @@ class FilterAnalyzer(BaseAnalyzer):
         if platform_data:
             results.append(
                 self._build_criteria_card(
-                    "平台限制 (Platform)", "platform", platform_data, module_to_plugin
+                    "平台限制 (Platform)", "platform", platform_data, snap
                 )
             )
 
@@ -658,7 +592,7 @@ class FilterAnalyzer(BaseAnalyzer):
         if msgtype_data:
             results.append(
                 self._build_criteria_card(
-                    "消息类型限制 (MsgType)", "msg_type", msgtype_data, module_to_plugin
+                    "消息类型限制 (MsgType)", "msg_type", msgtype_data, snap
                 )
             )
 
@@ -669,8 +603,8 @@ class FilterAnalyzer(BaseAnalyzer):
         title: str,
         tag_prefix: str,
         data: dict[str, list[StarHandlerMetadata]],
-        module_to_plugin: dict,
-    ) -> PluginMetadata:
+        snap: RegistrySnapshot,
+    ) -> LitePlugin:
         nodes = []
         sorted_keys = sorted(data.keys())
 
@@ -679,12 +613,7 @@ class FilterAnalyzer(BaseAnalyzer):
             children = []
 
             for h in handlers:
-                plugin = module_to_plugin.get(h.handler_module_path)
-                p_info = (
-                    self._get_safe_plugin_info(plugin)
-                    if plugin
-                    else self._get_safe_plugin_info(None)
-                )
+                p_info = snap.info_of(h.handler_module_path)
                 p_name = p_info["name"]
                 p_display = p_info["display_name"]
 
@@ -711,7 +640,7 @@ class FilterAnalyzer(BaseAnalyzer):
                 prio = h.extras_configs.get("priority", 0)
 
                 children.append(
-                    RenderNode(
+                    LiteNode(
                         name=main_name,
                         desc=full_desc,
                         is_group=False,
@@ -726,7 +655,7 @@ class FilterAnalyzer(BaseAnalyzer):
             )
 
             nodes.append(
-                RenderNode(
+                LiteNode(
                     name=filter_str,
                     desc=f"{len(children)} 个监听点",
                     is_group=True,
@@ -735,7 +664,7 @@ class FilterAnalyzer(BaseAnalyzer):
                 )
             )
 
-        return PluginMetadata(
+        return LitePlugin(
             name=f"filter_{tag_prefix}",
             display_name=title,
             version="",
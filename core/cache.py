@@ -0,0 +1,390 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from astrbot.api import logger
+
+from ..domain import InternalCFG
+from ..utils import FileLock, TypstLayout, atomic_write, calculate_hash
+from .worker import FragmentPlan
+
+
+@dataclass
+class _SearchEntry:
+    images: list[str]
+    size: int
+
+
+class SearchCache:
+    """搜索结果缓存
+
+    - 正缓存: LRU，同时受条目数与磁盘总字节数限制，淘汰时删除 WebP 文件
+    - 负缓存: 记录无匹配结果的查询，带 TTL
+    """
+
+    def __init__(self, data_dir: Path, max_entries: int, max_bytes: int):
+        self.data_dir = data_dir
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.total_bytes = 0
+        self._entries: OrderedDict[str, _SearchEntry] = OrderedDict()
+        self._empty: OrderedDict[str, float] = OrderedDict()
+        # 别名: 注册表指纹键 → 内容键，命中时可跳过分析
+        self._aliases: OrderedDict[str, str] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """大小写归一化，须与 SearchIndex 的匹配规则一致 (仅 lower，空白原样保留)"""
+        return query.lower()
+
+    def make_key(
+        self, mode: str, query: str, content_hash: str, config: dict[str, Any]
+    ) -> str:
+        raw = json.dumps(
+            [mode, self.normalize_query(query), content_hash, config],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return calculate_hash(raw)
+
+    def _empty_key(self, mode: str, query: str, fingerprint: str | None) -> str:
+        return f"{mode}\0{self.normalize_query(query)}\0{fingerprint or ''}"
+
+    # --- 负缓存 ---
+
+    def is_known_empty(
+        self, mode: str, query: str, fingerprint: str | None = None
+    ) -> bool:
+        key = self._empty_key(mode, query, fingerprint)
+        expires = self._empty.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._empty[key]
+            return False
+        return True
+
+    def mark_empty(self, mode: str, query: str, fingerprint: str | None = None):
+        if not self.enabled:
+            return
+        key = self._empty_key(mode, query, fingerprint)
+        self._empty[key] = time.monotonic() + InternalCFG.SEARCH_NEGATIVE_TTL
+        self._empty.move_to_end(key)
+        while len(self._empty) > self.max_entries:
+            self._empty.popitem(last=False)
+
+    # --- 正缓存 ---
+
+    def link(self, alias: str, key: str):
+        """登记别名 (指纹键 → 内容键)"""
+        if not self.enabled:
+            return
+        self._aliases[alias] = key
+        self._aliases.move_to_end(alias)
+        while len(self._aliases) > self.max_entries * 4:
+            self._aliases.popitem(last=False)
+
+    def get(self, key: str) -> list[str] | None:
+        key = self._aliases.get(key, key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # 文件被外部删除 → 视为失效
+        if not all(Path(p).exists() for p in entry.images):
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        # 刷新 mtime：其他实例启动时按最近使用时间清理残留结果
+        for p in entry.images:
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+        return entry.images
+
+    def put(self, key: str, images: list[str]) -> bool:
+        """登记渲染结果；返回 False 表示未被缓存 (调用方自行清理文件)"""
+        if not self.enabled:
+            return False
+        size = 0
+        for p in images:
+            try:
+                size += Path(p).stat().st_size
+            except OSError:
+                return False
+        if size > self.max_bytes:
+            return False
+
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = _SearchEntry(images=images, size=size)
+        self.total_bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+        return True
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.size
+        for p in entry.images:
+            try:
+                Path(p).unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 搜索缓存文件清理失败 {p}: {e}")
+
+    def sweep(self, max_age: float):
+        """删除超过 max_age 秒未被使用的搜索结果文件 (被终止 / 崩溃的进程遗留)
+
+        其他存活实例的结果在命中时会刷新 mtime，按时间筛选不会误删正在发送的文件
+        """
+        cutoff = time.time() - max_age
+        tracked = {p for entry in self._entries.values() for p in entry.images}
+        for f in self.data_dir.glob(f"{InternalCFG.SEARCH_FILE_PREFIX}*"):
+            if str(f) in tracked:
+                continue
+            try:
+                if f.stat().st_mtime < cutoff:
+                    f.unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 残留搜索结果清理失败 {f}: {e}")
+
+    def clear(self):
+        """清空缓存并删除本实例登记的搜索结果文件
+
+        共享 data_dir 的其他实例各自管理自己的结果，不按文件名前缀批量删除
+        """
+        for key in list(self._entries):
+            self._drop(key)
+        self._empty.clear()
+        self._aliases.clear()
+
+
+@dataclass
+class CacheEntry:
+    """一次静态渲染的缓存记录"""
+
+    content_hash: str
+    config: dict[str, Any]
+    stem: str
+    # 产物文件 [文件名, 字节数, mtime_ns]，按分片顺序
+    files: list[list]
+
+
+class CacheManifest:
+    """渲染缓存清单：单个 JSON 索引，记录每个静态菜单的内容 Hash、配置快照与产物文件
+
+    产物以 (大小, mtime) 登记，校验只需一次查找加若干 stat，不再读取 / 解码图片。
+    多个实例共享 data_dir 时，清单文件被替换后自动重新加载，写入经文件锁串行。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.root = path.parent
+        self._lock_path = path.with_name(f"{path.name}.lock")
+        self._signature: tuple[int, int] | None = None
+        self._entries: dict[str, CacheEntry] = {}
+        self._refresh()
+
+    def _refresh(self):
+        """清单文件变化 (其他实例发布) 时重新加载"""
+        try:
+            st = self.path.stat()
+            signature = (st.st_ino, st.st_mtime_ns)
+        except OSError:
+            signature = None
+        if signature != self._signature:
+            self._entries = self._load()
+            self._signature = signature
+
+    def _load(self) -> dict[str, CacheEntry]:
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        entries = {}
+        for key, item in raw.get("entries", {}).items():
+            try:
+                entries[key] = CacheEntry(**item)
+            except TypeError:
+                continue
+        return entries
+
+    def get(self, key: str) -> CacheEntry | None:
+        self._refresh()
+        return self._entries.get(key)
+
+    def images(self, key: str) -> list[str] | None:
+        """产物完整 (文件均在，大小与 mtime 与登记一致) 时返回图片路径"""
+        entry = self.get(key)
+        if entry is None or not entry.files:
+            return None
+        paths = []
+        for name, size, mtime_ns in entry.files:
+            path = self.root / name
+            try:
+                st = path.stat()
+            except OSError:
+                return None
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                return None
+            paths.append(str(path))
+        return paths
+
+    def stems(self) -> set[str]:
+        """清单引用的全部产物 stem"""
+        self._refresh()
+        return {entry.stem for entry in self._entries.values()}
+
+    def put(
+        self,
+        key: str,
+        content_hash: str,
+        config: dict[str, Any],
+        stem: str,
+        images: list[str],
+    ) -> CacheEntry | None:
+        """登记渲染结果并落盘，返回被替换的旧记录"""
+        files = []
+        for img in images:
+            st = Path(img).stat()
+            files.append([Path(img).name, st.st_size, st.st_mtime_ns])
+        # 读-改-写期间持有清单锁，避免覆盖其他实例同时登记的菜单
+        with FileLock(self._lock_path):
+            self._refresh()
+            previous = self._entries.get(key)
+            self._entries[key] = CacheEntry(
+                content_hash=content_hash, config=config, stem=stem, files=files
+            )
+            self._save()
+        return previous
+
+    def _save(self):
+        # 先写临时文件再改名：读者要么看到旧清单，要么看到完整的新清单
+        data = {"entries": {k: asdict(v) for k, v in self._entries.items()}}
+        with atomic_write(self.path) as tmp:
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        st = self.path.stat()
+        self._signature = (st.st_ino, st.st_mtime_ns)
+
+
+class FragmentCache:
+    """卡片片段缓存 (仅静态菜单)
+
+    每张卡片按 (卡片类型, 宽度, 插件数据, 模板版本, ppi) 内容寻址，存为 PNG；
+    插件变动时只需编译新增/变动的卡片，其余直接参与拼接。
+    index.json 记录各菜单当前引用的片段，不再被引用的片段随之删除。
+
+    plan / commit 持有同一把文件锁：plan 复用已有片段时刷新其 mtime，
+    commit 只删除未被任何菜单登记、且超过宽限期未被复用的片段，
+    因此其他实例 plan 之后、commit 之前依赖的片段不会被抢先删除。
+    """
+
+    def __init__(self, root: Path, template_path: Path, grace: float):
+        self.root = root
+        self.template_path = template_path
+        # plan 到 commit 的最长间隔 (编译超时)，期间被复用 / 新编译的片段不回收
+        self.grace = grace
+        self._index_path = root / "index.json"
+        self._lock_path = root / "index.lock"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def plan(self, json_str: str, ppi: float) -> FragmentPlan:
+        with FileLock(self._lock_path):
+            return self._plan(json_str, ppi)
+
+    def _plan(self, json_str: str, ppi: float) -> FragmentPlan:
+        payload = json.loads(json_str)
+        # 模板改动会改变卡片外观，模板内容计入 key
+        template_version = calculate_hash(
+            self.template_path.read_text(encoding="utf-8")
+        )
+
+        width = InternalCFG.PAGE_WIDTH_PT - 2 * InternalCFG.PAGE_MARGIN_PT
+        col_width = TypstLayout.column_width(max(1, len(payload["columns"])))
+
+        cards: list[dict[str, Any]] = []
+        missing: list[str] = []
+
+        def add(kind: str, card_width: float, plugin: dict[str, Any]) -> str:
+            key = calculate_hash(
+                json.dumps(
+                    [kind, card_width, ppi, template_version, plugin],
+                    ensure_ascii=False,
+                    sort_keys=True,
+                )
+            )
+            if key in missing:
+                return key
+            try:
+                # 标记为复用中，宽限期内不会被其他菜单的 commit 回收
+                os.utime(self.root / f"{key}.png")
+            except FileNotFoundError:
+                missing.append(key)
+                cards.append({"kind": kind, "width": card_width, "plugin": plugin})
+            return key
+
+        giants = [add("giant", width, p) for p in payload["giants"]]
+        columns = [
+            [add("standard", col_width, p) for p in col] for col in payload["columns"]
+        ]
+
+        # 主流程只保留页首；卡片与页尾走片段页
+        doc = {
+            **payload,
+            "giants": [],
+            "columns": [],
+            "singles": [],
+            "sections": ["header"],
+            "fragments": {"cards": cards, "singles": payload["singles"]},
+        }
+        return FragmentPlan(
+            fragment_dir=str(self.root),
+            doc_json=json.dumps(doc, ensure_ascii=False, separators=(",", ":")),
+            missing=missing,
+            giants=giants,
+            columns=columns,
+            column_pitch=col_width + InternalCFG.COLUMN_GUTTER_PT,
+        )
+
+    def commit(self, mode: str, plan: FragmentPlan):
+        """登记菜单当前引用的片段，并回收已无菜单引用的旧片段"""
+        # 共享 data_dir 的其他实例可能同时登记其他菜单 / 规划片段
+        with FileLock(self._lock_path):
+            index = self._load_index()
+            index[mode] = sorted(set(plan.giants).union(*plan.columns))
+            with atomic_write(self._index_path) as tmp:
+                tmp.write_text(json.dumps(index), encoding="utf-8")
+
+            # 其他菜单正在编译的新片段尚未登记，但 mtime 在宽限期内，不会被误删
+            in_use = set().union(*map(set, index.values()))
+            cutoff = time.time() - self.grace
+            for path in self.root.glob("*.png"):
+                if path.stem in in_use:
+                    continue
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"[HelpTypst] 片段缓存清理失败 {path.name}: {e}")
+
+    def _load_index(self) -> dict[str, list[str]]:
+        try:
+            return json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
@@ -0,0 +1,207 @@
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from astrbot.api import logger
+
+from ..utils import atomic_write
+
+# 缓存/结果事件 → 展示名
+EVENT_LABELS: dict[str, str] = {
+    "hit_fingerprint": "指纹命中",
+    "hit_content": "内容命中",
+    "hit_stale": "过期返回",
+    "hit_store": "存储命中",
+    "hit_search": "搜索命中",
+    "hit_negative": "无结果命中",
+    "miss": "编译",
+    "empty": "无内容",
+    "coalesced": "合并",
+    "timeout": "超时",
+    "error": "失败",
+}
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# 输出体积与耗时共用样本窗口，以此名称区分
+OUTPUT_BYTES = "output_bytes"
+
+
+def _quantile(values: list[float], q: float) -> float:
+    """最近秩分位数 (values 已排序)"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _format(stage: str, value: float) -> str:
+    if stage == OUTPUT_BYTES:
+        return f"{value / 1024:.0f}KiB"
+    return f"{value * 1000:.0f}ms"
+
+
+@contextmanager
+def record_stage(timings: dict[str, float], stage: str):
+    """把耗时累加到 timings[stage]
+
+    供线程内的数据流水线使用，回到事件循环后再统一登记到 RenderMetrics
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+class RenderMetrics:
+    """渲染指标
+
+    - 分阶段耗时: 每个 (mode, stage) 保留最近 window 个样本，计算滚动分位数
+    - 事件计数: 缓存命中/未命中、请求合并、超时、失败 (累计)
+    - 输出体积: 每次编译产出的图片总字节数
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: dict[tuple[str, str], deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+        # 累计值 (Prometheus summary 的 _sum / _count)
+        self._totals: dict[tuple[str, str], list[float]] = defaultdict(
+            lambda: [0.0, 0]
+        )
+        self._events: Counter[tuple[str, str]] = Counter()
+        self._export_task: asyncio.Task | None = None
+
+    # --- 记录 ---
+
+    def observe(self, mode: str, stage: str, value: float):
+        key = (mode, stage)
+        self._samples[key].append(value)
+        total = self._totals[key]
+        total[0] += value
+        total[1] += 1
+
+    @contextmanager
+    def timer(self, mode: str, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(mode, stage, time.perf_counter() - start)
+
+    def incr(self, mode: str, event: str):
+        self._events[(mode, event)] += 1
+
+    # --- 输出 ---
+
+    def summary(self) -> str:
+        """管理员指令展示用的文本摘要"""
+        modes = sorted({m for m, _ in self._samples} | {m for m, _ in self._events})
+        if not modes:
+            return "暂无渲染统计。"
+
+        lines = [f"📊 渲染统计 (每项最近 {self.window} 次)"]
+        for mode in modes:
+            events = " | ".join(
+                f"{label} {self._events[(mode, ev)]}"
+                for ev, label in EVENT_LABELS.items()
+                if self._events[(mode, ev)]
+            )
+            lines.append(f"[{mode}] {events or '无事件'}")
+            for (m, stage), samples in sorted(self._samples.items()):
+                if m != mode or not samples:
+                    continue
+                values = sorted(samples)
+                qs = "  ".join(
+                    f"p{int(q * 100)} {_format(stage, _quantile(values, q))}"
+                    for q in QUANTILES
+                )
+                lines.append(f"  {stage:<12} {qs}  (n={len(values)})")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        out = [
+            "# HELP helptypst_stage_seconds 渲染各阶段耗时 (滚动窗口分位数)",
+            "# TYPE helptypst_stage_seconds summary",
+        ]
+        sizes = []
+        for (mode, stage), samples in sorted(self._samples.items()):
+            if not samples:
+                continue
+            if stage == OUTPUT_BYTES:
+                sizes.append((mode, samples))
+                continue
+            labels = f'mode="{mode}",stage="{stage}"'
+            out.extend(self._summary_lines("helptypst_stage_seconds", labels, samples))
+            total, count = self._totals[(mode, stage)]
+            out.append(f"helptypst_stage_seconds_sum{{{labels}}} {total:.6f}")
+            out.append(f"helptypst_stage_seconds_count{{{labels}}} {count}")
+
+        out += [
+            "# HELP helptypst_output_bytes 单次编译输出的图片总字节数",
+            "# TYPE helptypst_output_bytes summary",
+        ]
+        for mode, samples in sizes:
+            labels = f'mode="{mode}"'
+            out.extend(self._summary_lines("helptypst_output_bytes", labels, samples))
+            total, count = self._totals[(mode, OUTPUT_BYTES)]
+            out.append(f"helptypst_output_bytes_sum{{{labels}}} {total:.0f}")
+            out.append(f"helptypst_output_bytes_count{{{labels}}} {count}")
+
+        out += [
+            "# HELP helptypst_events_total 缓存命中/未命中等事件计数",
+            "# TYPE helptypst_events_total counter",
+        ]
+        for (mode, event), n in sorted(self._events.items()):
+            out.append(f'helptypst_events_total{{mode="{mode}",event="{event}"}} {n}')
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _summary_lines(name: str, labels: str, samples: deque[float]) -> list[str]:
+        values = sorted(samples)
+        return [
+            f'{name}{{{labels},quantile="{q}"}} {_quantile(values, q):.6g}'
+            for q in QUANTILES
+        ]
+
+    @staticmethod
+    def write(path: Path, text: str):
+        """写入指标文件 (先写临时文件再改名，抓取方不会读到半截内容)"""
+        with atomic_write(path) as tmp:
+            tmp.write_text(text, encoding="utf-8")
+
+    async def export(self, path: Path):
+        """在事件循环上生成快照 (指标字典只在循环内修改)，再在线程中落盘"""
+        await asyncio.to_thread(self.write, path, self.to_prometheus())
+
+    # --- 定期导出 ---
+
+    def start_export(self, path: Path, interval: float):
+        if self._export_task is None:
+            self._export_task = asyncio.create_task(self._export_loop(path, interval))
+
+    async def stop_export(self, path: Path):
+        task, self._export_task = self._export_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # 退出前写一份最终快照 (失败不影响后续清理)
+        try:
+            await self.export(path)
+        except Exception as e:
+            logger.warning(f"[HelpTypst] 指标文件写入失败: {e}")
+
+    async def _export_loop(self, path: Path, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.export(path)
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 指标文件写入失败: {e}")
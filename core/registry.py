@@ -0,0 +1,244 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from astrbot.api.star import Context
+from astrbot.core.star.filter.command import CommandFilter
+from astrbot.core.star.filter.command_group import CommandGroupFilter
+from astrbot.core.star.filter.event_message_type import EventMessageTypeFilter
+from astrbot.core.star.filter.permission import PermissionTypeFilter
+from astrbot.core.star.filter.platform_adapter_type import PlatformAdapterTypeFilter
+from astrbot.core.star.filter.regex import RegexFilter
+from astrbot.core.star.star_handler import StarHandlerMetadata, star_handlers_registry
+
+from ..utils import PluginConfig
+
+
+def safe_plugin_info(star_meta: Any) -> dict[str, Any]:
+    """针对不规范的插件元信息进行防御性编程"""
+    if not star_meta:
+        return {"name": "Unknown", "display_name": None, "version": "", "desc": ""}
+
+    # 智能名称
+    raw_name = getattr(star_meta, "name", None)  # 标准插件名 (metadata.yaml 或 @register)
+    raw_root_dir = getattr(star_meta, "root_dir_name", None)  # 目录名
+    raw_module = getattr(star_meta, "module_path", None)  # 模块路径
+
+    # 决策树
+    if raw_name:
+        safe_name = str(raw_name)
+    elif raw_root_dir:
+        safe_name = str(raw_root_dir)
+    elif raw_module:
+        parts = str(raw_module).split(".")
+        safe_name = parts[-2] if len(parts) > 2 and parts[-1] == "main" else parts[-1]
+    else:
+        safe_name = f"Unknown_{id(star_meta)}"  # 正常不应走到这，因为无标识符插件根本加载不了
+
+    # 其他字段
+    display = getattr(star_meta, "display_name", None)
+    if not display:
+        display = None
+
+    version = str(getattr(star_meta, "version", "")) or ""
+    desc = str(getattr(star_meta, "desc", "")) or ""
+
+    return {
+        "name": safe_name,
+        "display_name": display,
+        "version": version,
+        "desc": desc,
+        "raw_module": raw_module,  # handler 查找
+    }
+
+
+@dataclass(slots=True)
+class PluginEntry:
+    """已加载插件 + 预先整理好的元信息"""
+
+    star: Any
+    info: dict[str, Any]
+    # 已激活且不在黑名单中
+    visible: bool
+
+
+@dataclass(slots=True)
+class HandlerEntry:
+    """Handler + 按类型预先分拣的 Filter (各类型内保持注册顺序)"""
+
+    handler: StarHandlerMetadata
+    command: CommandFilter | None = None
+    group: CommandGroupFilter | None = None
+    is_admin: bool = False
+    regexes: list[str] = field(default_factory=list)
+    platforms: list[PlatformAdapterTypeFilter] = field(default_factory=list)
+    msg_types: list[EventMessageTypeFilter] = field(default_factory=list)
+
+    @property
+    def is_command(self) -> bool:
+        return self.command is not None or self.group is not None
+
+
+@dataclass(slots=True)
+class _TrieNode:
+    children: dict[str, "_TrieNode"] = field(default_factory=dict)
+    handlers: list[HandlerEntry] | None = None
+    # 该路径本身是某个插件的 module_path
+    owned: bool = False
+
+
+class ModuleTrie:
+    """按点分模块路径组织的前缀树：handler 模块 → Handler 列表
+
+    解析顺序 (确定性，代价与路径深度成正比):
+    1. 精确命中
+    2. 最长祖先前缀 (如插件 a.b.main，handler 注册在 a.b)
+    3. 子树 (如插件 a.b，handler 注册在 a.b.main / a.b.cmds)，按路径排序合并
+    已属于其他插件的路径不参与 2/3，避免同一批 handler 被重复归属
+    """
+
+    def __init__(
+        self, handlers_by_module: dict[str, list[HandlerEntry]], plugin_modules
+    ):
+        self._root = _TrieNode()
+        for module, handlers in handlers_by_module.items():
+            self._node(module).handlers = handlers
+        for module in plugin_modules:
+            self._node(module).owned = True
+
+    def _node(self, module: str) -> _TrieNode:
+        node = self._root
+        for part in module.split("."):
+            node = node.children.setdefault(part, _TrieNode())
+        return node
+
+    def resolve(self, module: str) -> list[HandlerEntry]:
+        node = self._root
+        ancestor = None
+        parts = module.split(".")
+        for i, part in enumerate(parts):
+            node = node.children.get(part)
+            if node is None:
+                return ancestor or []
+            if i == len(parts) - 1:
+                break
+            if node.handlers and not node.owned:
+                ancestor = node.handlers
+
+        if node.handlers:
+            return node.handlers
+        if ancestor:
+            return ancestor
+        return self._collect(node)
+
+    def _collect(self, node: _TrieNode) -> list[HandlerEntry]:
+        result: list[HandlerEntry] = []
+        for key in sorted(node.children):
+            child = node.children[key]
+            if child.owned:
+                continue
+            if child.handlers:
+                result.extend(child.handlers)
+            result.extend(self._collect(child))
+        return result
+
+
+class RegistrySnapshot:
+    """注册表快照：一次遍历完成 插件信息 / 模块映射 / Handler 分拣，供所有分析器共享"""
+
+    def __init__(self, context: Context, config: PluginConfig):
+        ignored = set(config.ignored_plugins)
+
+        # 1. 插件: 按加载顺序；同一模块路径以后出现者为准
+        self.plugins: list[PluginEntry] = []
+        self.by_module: dict[str, PluginEntry] = {}
+        for star in context.get_all_stars():
+            info = safe_plugin_info(star)
+            entry = PluginEntry(
+                star=star,
+                info=info,
+                visible=bool(star.activated) and info["name"] not in ignored,
+            )
+            self.plugins.append(entry)
+            if star.module_path:
+                self.by_module[star.module_path] = entry
+        self.unknown_info = safe_plugin_info(None)
+
+        # 2. Handler: 注册顺序 + 按模块分组
+        self.handlers: list[HandlerEntry] = []
+        self.handlers_by_module: dict[str, list[HandlerEntry]] = {}
+        self._by_handler: dict[int, HandlerEntry] = {}
+        for handler in star_handlers_registry:
+            if not isinstance(handler, StarHandlerMetadata):
+                continue
+            entry = self._classify(handler)
+            self.handlers.append(entry)
+            self._by_handler[id(handler)] = entry
+            if handler.handler_module_path:
+                self.handlers_by_module.setdefault(
+                    handler.handler_module_path, []
+                ).append(entry)
+
+        # 模块路径前缀索引 (插件 module_path → 所属 handler)
+        self.modules = ModuleTrie(self.handlers_by_module, self.by_module)
+
+        # 3. 函数工具
+        self.tools: list[Any] = []
+        if hasattr(context, "get_llm_tool_manager"):
+            tool_manager = context.get_llm_tool_manager()
+            if tool_manager:
+                self.tools = list(tool_manager.func_list)
+
+    @staticmethod
+    def _classify(handler: StarHandlerMetadata) -> HandlerEntry:
+        entry = HandlerEntry(handler=handler)
+        for f in getattr(handler, "event_filters", None) or ():
+            if isinstance(f, CommandGroupFilter):
+                if entry.group is None:
+                    entry.group = f
+            elif isinstance(f, CommandFilter):
+                if entry.command is None:
+                    entry.command = f
+            elif isinstance(f, PermissionTypeFilter):
+                entry.is_admin = True
+            elif isinstance(f, RegexFilter):
+                entry.regexes.append(f.regex_str)
+            elif isinstance(f, PlatformAdapterTypeFilter):
+                entry.platforms.append(f)
+            elif isinstance(f, EventMessageTypeFilter):
+                entry.msg_types.append(f)
+        return entry
+
+    def entry_of(self, handler: Any) -> HandlerEntry | None:
+        """Handler 对象 → 快照条目 (指令组的子指令经 handler_md 反查)"""
+        if handler is None:
+            return None
+        entry = self._by_handler.get(id(handler))
+        if entry is None and isinstance(handler, StarHandlerMetadata):
+            # 不在注册表中的 handler (理论上不会出现) 现场分拣
+            entry = self._classify(handler)
+        return entry
+
+    def info_of(self, module_path: str | None) -> dict[str, Any]:
+        entry = self.by_module.get(module_path) if module_path else None
+        return entry.info if entry else self.unknown_info
+
+
+class RegistrySnapshots:
+    """按注册表指纹缓存最近一次快照，三个分析器共用同一份"""
+
+    def __init__(self, context: Context, config: PluginConfig):
+        self.context = context
+        self.cfg = config
+        self._latest: tuple[str, RegistrySnapshot] | None = None
+        # 分析在线程池中执行，多个菜单可能同时请求快照
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str | None = None) -> RegistrySnapshot:
+        """指纹为空时总是重新扫描 (不缓存)"""
+        if not fingerprint:
+            return RegistrySnapshot(self.context, self.cfg)
+        with self._lock:
+            if self._latest is None or self._latest[0] != fingerprint:
+                self._latest = (fingerprint, RegistrySnapshot(self.context, self.cfg))
+            return self._latest[1]
@@ -1,17 +1,41 @@
 import asyncio
 import json
+import os
 import time
 import uuid
 from collections.abc import Callable
 from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
 from pathlib import Path
 from typing import Any
 
 from astrbot.api import logger
 
 from ..domain import InternalCFG
-from ..utils import PluginConfig, calculate_hash, verify_image_header
-from .worker import RenderTask, execute_render_task
+from ..utils import (
+    CardHeights,
+    FileLock,
+    PluginConfig,
+    TypstLayout,
+    atomic_write,
+    calculate_hash,
+)
+from .cache import CacheManifest, FragmentCache, SearchCache
+from .metrics import OUTPUT_BYTES, RenderMetrics
+from .store import create_store
+from .worker import (
+    RenderOutput,
+    RenderTask,
+    compile_shard,
+    execute_fragment_task,
+    execute_render_task,
+    execute_stitch_task,
+    warmup_worker,
+)
+
+
+# 数据流水线 (在线程中执行)：把分析 / 布局耗时写入传入的字典，返回紧凑布局 JSON
+DataProvider = Callable[[dict[str, float]], str | None]
 
 
 class AsyncNullContext:  # 异步空上下文
@@ -23,11 +47,24 @@ class AsyncNullContext:  # 异步空上下文
 
 
 class RenderResult:
-    """渲染结果封装"""
+    """渲染结果封装
+
+    合并的并发请求共享同一个结果，temp_files 由最后一个用完结果的持有方清理
+    """
 
     def __init__(self, images: list[str], temp_files: list[Path]):
         self.images = images
         self.temp_files = temp_files
+        self._holders = 1
+
+    def share(self, holders: int):
+        """登记持有方数量 (合并请求的等待方个数)"""
+        self._holders = holders
+
+    def release(self) -> list[Path]:
+        """持有方用完结果，返回需要清理的临时文件 (仅最后一个持有方非空)"""
+        self._holders -= 1
+        return self.temp_files if self._holders <= 0 else []
 
 
 class TypstRenderer:
@@ -37,17 +74,341 @@ class TypstRenderer:
         template_path: Path,
         font_dir: Path,
         config: PluginConfig,
+        heights: CardHeights | None = None,
     ):
         self.data_dir = data_dir
         self.template_path = template_path
         self.font_dir = font_dir
         self.cfg = config
         self._compile_semaphore = asyncio.Semaphore(self.cfg.max_concurrent_tasks)
-        self._cache_locks = {k: asyncio.Lock() for k in InternalCFG.CACHE_FILES.keys()}
+
+        # 常驻渲染进程池 (start/shutdown 管理生命周期)
+        self._pool: ProcessPoolExecutor | None = None
 
         # 静态资源锁
         self._cache_locks = {k: asyncio.Lock() for k in InternalCFG.CACHE_FILES.keys()}
 
+        # 进行中的渲染 (single-flight): (mode, query, 指纹) → Future / 等待方个数
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._waiters: dict[tuple, int] = {}
+
+        # 静态菜单已验证的注册表指纹: mode → fingerprint
+        self._verified: dict[str, str] = {}
+
+        # 静态菜单缓存清单: mode → 内容 Hash / 配置快照 / 当前发布的产物
+        # 每次编译写入新版本 stem，完成后更新清单，旧版本延迟删除
+        self._manifest = CacheManifest(self.data_dir / InternalCFG.MANIFEST_FILE)
+        self._retiring: dict[str, asyncio.TimerHandle] = {}
+        self._swept = False
+
+        # 过期返回 (stale-while-revalidate): 过期菜单首次被返回的时间 / 后台刷新任务
+        self._stale_since: dict[str, float] = {}
+        self._revalidating: dict[str, asyncio.Task] = {}
+
+        # 搜索结果缓存
+        self._search_cache = SearchCache(
+            data_dir=self.data_dir,
+            max_entries=self.cfg.search_cache_entries,
+            max_bytes=self.cfg.search_cache_mb * 1024 * 1024,
+        )
+
+        # 渲染指标 (分阶段耗时 / 缓存命中 / 输出体积)
+        self.metrics = RenderMetrics(window=InternalCFG.METRICS_WINDOW)
+
+        # 卡片片段缓存 (静态菜单，开启 fragment_cache 后首次使用时创建)
+        self._fragments: FragmentCache | None = None
+
+        # 卡片实测高度表 (静态菜单编译后回读，供布局分列)
+        self.heights = heights
+
+        # 渲染产物存储 (默认关闭；静态菜单按内容寻址，供多节点共享目录 / Redis)
+        self._store = create_store(self.cfg, self.data_dir)
+        # 模板改动会改变渲染结果，模板内容计入存储 key
+        self._template_version = calculate_hash(
+            self.template_path.read_text(encoding="utf-8")
+        )
+
+    def start(self):
+        """启动常驻进程池，并预热全部 worker"""
+        if self._pool is not None:
+            return
+        if not self._swept:
+            # 仅首次启动时清理 (进程池回收重建时可能有渲染正在写入新版本，
+            # 已缓存的搜索结果也可能仍在发送)
+            self._search_cache.clear()
+            self._search_cache.sweep(InternalCFG.ARTIFACT_RETIRE_DELAY)
+            self._sweep_versions()
+            self._swept = True
+        self._spawn_pool()
+
+    def _spawn_pool(self):
+        """创建进程池，并预热全部 worker"""
+        workers = max(1, self.cfg.max_concurrent_tasks)
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        # 提前拉起子进程，避免首个请求承担 spawn + import 开销
+        for _ in range(workers):
+            self._pool.submit(
+                warmup_worker, str(self.template_path), [str(self.font_dir)]
+            )
+        logger.debug(f"[HelpTypst] 渲染进程池已启动 (workers={workers})")
+
+    async def shutdown(self):
+        """关闭进程池"""
+        pool, self._pool = self._pool, None
+        self._search_cache.clear()
+        for task in self._revalidating.values():
+            task.cancel()
+        self._revalidating.clear()
+        # 不再有读者，待下线的旧版本立即删除
+        for stem, handle in self._retiring.items():
+            handle.cancel()
+            self._remove_artifacts(stem)
+        self._retiring.clear()
+        if self._store is not None:
+            # Redis 连接关闭可能阻塞，不占用事件循环
+            await asyncio.to_thread(self._store.close)
+        if pool is None:
+            return
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    async def _run_in_pool(self, metric: str, fn: Callable, *args):
+        """在常驻进程池中执行渲染任务 (受并发信号量 & 编译超时限制)
+
+        metric: 指标分组名；子进程返回 RenderOutput 时同时记录其内部各阶段耗时
+        """
+        waited = time.perf_counter()
+        async with self._compile_semaphore:
+            self.metrics.observe(metric, "queue", time.perf_counter() - waited)
+            if self._pool is None:
+                self.start()
+            pool = self._pool
+            submitted = time.time()
+            future = asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            try:
+                result = await asyncio.wait_for(
+                    future, timeout=self.cfg.timeout_compile
+                )
+            except asyncio.TimeoutError:
+                # 卡死的 worker 无法被取消，只能杀掉整个进程池后重建
+                # (多个分片同时超时时只回收一次)
+                if self._pool is pool:
+                    self._recycle_pool()
+                raise
+
+        if isinstance(result, RenderOutput):
+            # 派发: 提交 → 子进程开始执行 (含序列化、排队与进程拉起)
+            self.metrics.observe(metric, "dispatch", result.started_at - submitted)
+            for stage, seconds in result.timings.items():
+                self.metrics.observe(metric, stage, seconds)
+        return result
+
+    async def _run_sharded(
+        self, metric: str, task: RenderTask, shards: list[str]
+    ) -> RenderOutput:
+        """分片并行编译，再在子进程中拼接编码"""
+        logger.debug(f"[HelpTypst] 分片并行编译: {len(shards)} 片")
+        with self.metrics.timer(metric, "compile"):
+            results = await asyncio.gather(
+                *(
+                    self._run_in_pool(
+                        metric, compile_shard, replace(task, json_str=shard)
+                    )
+                    for shard in shards
+                ),
+                return_exceptions=True,
+            )
+        # 任一分片超时即视为整体超时 (被连带回收的分片会报进程池损坏)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise next(
+                (e for e in errors if isinstance(e, asyncio.TimeoutError)), errors[0]
+            )
+        output = await self._run_in_pool(
+            metric, execute_stitch_task, task, [png for png, _ in results]
+        )
+        output.card_heights = [h for _, heights in results for h in heights]
+        return output
+
+    def _record_heights(self, measured: list[dict], mode: str):
+        """登记瀑布流卡片实测高度；有变化时落盘
+
+        该模式的高度表版本随之递增，计入其指纹后，下次请求 / 预渲染会按实测值重新分列
+        """
+        if self.heights.update(measured, mode):
+            logger.debug(f"[HelpTypst] 卡片实测高度已更新: {len(measured)} 张")
+            self.heights.save()
+
+    def _recycle_pool(self):
+        """强制终止当前进程池的所有子进程，并重建进程池"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            # ProcessPoolExecutor 未公开进程句柄，只能访问私有属性
+            for proc in list((getattr(pool, "_processes", None) or {}).values()):
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("[HelpTypst] 编译超时，已回收渲染进程池。")
+        # 只重建进程池，不重置缓存
+        self._spawn_pool()
+
+    def _remove_artifacts(self, stem: str):
+        """删除某次渲染的 PNG / WebP 产物 (含分片及编码中途被终止遗留的临时文件)"""
+        candidates = [
+            self.data_dir / f"{stem}.png",
+            self.data_dir / f"{stem}.webp",
+            *self.data_dir.glob(f"{stem}_part*.webp"),
+            *self.data_dir.glob(f"{stem}*.tmp"),
+        ]
+        for p in candidates:
+            try:
+                p.unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 残留文件清理失败 {p}: {e}")
+
+    def _sweep_versions(self):
+        """清理未被清单引用的静态产物 (上次运行未来得及下线的旧版本) 与旧版遗留文件"""
+        self._remove_legacy()
+        stems = self._manifest.stems()
+        # 共享 data_dir 的其他实例刚下线的旧版本可能仍在发送，留给其自行删除
+        cutoff = time.time() - InternalCFG.ARTIFACT_RETIRE_DELAY
+        for base in InternalCFG.CACHE_FILES.values():
+            lock = FileLock(self._lock_path(base))
+            if not lock.try_acquire():
+                # 其他实例正在渲染该菜单，新版本尚未登记
+                continue
+            try:
+                for p in self.data_dir.glob(f"{base}*"):
+                    if p.suffix == ".tmp":
+                        # 编码中途 worker 被终止 (如编译超时回收) 遗留的临时文件
+                        pass
+                    elif p.suffix not in (".webp", ".png"):
+                        continue
+                    elif p.stem.split("_part", 1)[0] in stems:
+                        continue
+                    try:
+                        if p.stat().st_mtime < cutoff:
+                            p.unlink(missing_ok=True)
+                    except Exception as e:
+                        logger.warning(f"[HelpTypst] 旧版本产物清理失败 {p}: {e}")
+            finally:
+                lock.release()
+
+    def _remove_legacy(self):
+        """删除旧版本插件写入、现已不再使用的文件"""
+        for pattern in InternalCFG.LEGACY_FILE_PATTERNS:
+            for p in self.data_dir.glob(pattern):
+                try:
+                    p.unlink(missing_ok=True)
+                except Exception as e:
+                    logger.warning(f"[HelpTypst] 旧版文件清理失败 {p}: {e}")
+
+    def _lock_path(self, stem: str) -> Path:
+        """静态菜单的跨进程锁文件"""
+        return self.data_dir / f"{stem}.lock"
+
+    def _retire(self, stem: str):
+        """旧版本产物延迟删除：刚拿到旧路径的请求可能仍在发送"""
+        if stem in self._retiring:
+            return
+
+        def remove():
+            self._retiring.pop(stem, None)
+            self._remove_artifacts(stem)
+
+        self._retiring[stem] = asyncio.get_running_loop().call_later(
+            InternalCFG.ARTIFACT_RETIRE_DELAY, remove
+        )
+
+    async def _publish(
+        self,
+        mode: str,
+        content_hash: str,
+        stem: str,
+        images: list[str],
+        fingerprint: str | None,
+    ):
+        """登记静态菜单新版本 (清单原子替换)，旧版本延迟下线"""
+        previous = await asyncio.to_thread(
+            self._manifest.put,
+            mode,
+            content_hash,
+            self._get_config_snapshot(),
+            stem,
+            images,
+        )
+        if previous and previous.stem != stem:
+            self._retire(previous.stem)
+        self._mark_verified(mode, fingerprint)
+
+    def _store_key(self, mode: str, content_hash: str) -> str:
+        """渲染产物存储 key：插件集合与配置相同的节点得到相同的 key"""
+        raw = json.dumps(
+            [mode, content_hash, self._get_config_snapshot(), self._template_version],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return calculate_hash(raw)
+
+    async def _restore(
+        self,
+        mode: str,
+        stem: str,
+        content_hash: str,
+        fingerprint: str | None,
+    ) -> list[str] | None:
+        """从渲染产物存储取回图片并发布为新版本；存储不可用时视为未命中"""
+        key = self._store_key(mode, content_hash)
+        out_stem = self._new_stem(stem)
+        try:
+            chunks = await asyncio.to_thread(self._store.get, key)
+            if not chunks:
+                return None
+            images = await asyncio.to_thread(self._write_chunks, out_stem, chunks)
+            await self._publish(mode, content_hash, out_stem, images, fingerprint)
+        except Exception as e:
+            logger.warning(f"[HelpTypst] 渲染产物存储读取失败: {e}")
+            self._remove_artifacts(out_stem)
+            return None
+        return images
+
+    async def _save_to_store(self, mode: str, content_hash: str, images: list[str]):
+        """编译结果写入渲染产物存储 (失败不影响本次渲染)"""
+        key = self._store_key(mode, content_hash)
+        try:
+            chunks = await asyncio.to_thread(
+                lambda: [Path(p).read_bytes() for p in images]
+            )
+            await asyncio.to_thread(self._store.put, key, chunks)
+        except Exception as e:
+            logger.warning(f"[HelpTypst] 渲染产物存储写入失败: {e}")
+
+    def _write_chunks(self, stem: str, chunks: list[bytes]) -> list[str]:
+        """分片落盘 (命名与编码输出一致，先写临时文件再改名)"""
+        if len(chunks) == 1:
+            names = [f"{stem}.webp"]
+        else:
+            names = [f"{stem}_part{i + 1}.webp" for i in range(len(chunks))]
+        paths = []
+        for name, chunk in zip(names, chunks):
+            path = self.data_dir / name
+            with atomic_write(path) as tmp:
+                tmp.write_bytes(chunk)
+            paths.append(str(path))
+        return paths
+
+    @staticmethod
+    def _new_stem(stem: str) -> str:
+        """静态菜单新版本的产物 stem"""
+        return f"{stem}_v{uuid.uuid4().hex[:8]}"
+
+    def _mark_verified(self, mode: str, fingerprint: str | None):
+        """静态菜单已与当前注册表一致"""
+        if fingerprint:
+            self._verified[mode] = fingerprint
+        self._stale_since.pop(mode, None)
+
     def _get_config_snapshot(self) -> dict[str, Any]:
         """渲染配置的快照字典"""
         snapshot = {}
@@ -57,123 +418,391 @@ class TypstRenderer:
         return snapshot
 
     async def render(
-        self, data_provider: Callable[[Path], int], mode: str, query: str | None = None
+        self,
+        data_provider: DataProvider,
+        mode: str,
+        query: str | None = None,
+        fingerprint: str | None = None,
+        allow_stale: bool = True,
+    ) -> tuple[RenderResult | None, str]:
+        """渲染入口：相同 mode + query + 指纹的并发请求合并为一次渲染
+
+        data_provider: 返回紧凑布局 JSON，无内容时返回 None；
+            各阶段耗时 (analysis / layout) 写入传入的字典
+        fingerprint: 注册表指纹，与上次一致时可跳过分析直接命中缓存
+        allow_stale: 启用 serve_stale 时，静态菜单可先返回上一版本并在后台刷新
+        """
+        if allow_stale and not query and self.cfg.serve_stale:
+            stale = self._serve_stale(data_provider, mode, fingerprint)
+            if stale is not None:
+                return stale, ""
+
+        key = (
+            mode,
+            SearchCache.normalize_query(query) if query else None,
+            fingerprint,
+        )
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.metrics.incr(self._metric_name(mode, query), "coalesced")
+            self._waiters[key] += 1
+        else:
+            shared = asyncio.ensure_future(
+                self._traced_render(data_provider, mode, query, fingerprint)
+            )
+            self._inflight[key] = shared
+            self._waiters[key] = 1
+
+            def _release(fut: asyncio.Future, key=key):
+                if self._inflight.get(key) is not fut:
+                    return
+                del self._inflight[key]
+                # 先于各等待方的回调执行：此后不再有新的等待方加入
+                holders = self._waiters.pop(key)
+                if not fut.cancelled() and fut.exception() is None:
+                    result, _ = fut.result()
+                    if result is not None:
+                        result.share(holders)
+
+            shared.add_done_callback(_release)
+        # shield: 单个等待方被取消时不影响其他等待方
+        try:
+            return await asyncio.shield(shared)
+        except asyncio.CancelledError:
+            # 被取消的等待方不会发送结果，渲染完成后交还其持有份额
+            shared.add_done_callback(self._abandon)
+            raise
+
+    @staticmethod
+    def _abandon(fut: asyncio.Future):
+        """放弃一份合并结果；最后一个持有方放弃时直接删除临时文件"""
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        result, _ = fut.result()
+        if result is None:
+            return
+        for p in result.release():
+            try:
+                p.unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 临时文件清理失败 {p}: {e}")
+
+    def _serve_stale(
+        self,
+        data_provider: DataProvider,
+        mode: str,
+        fingerprint: str | None,
+    ) -> RenderResult | None:
+        """直接返回上一次发布的静态菜单，同时在后台重新渲染
+
+        已验证 / 无已发布产物 / 超过最大过期时长时返回 None，走常规流程
+        """
+        if fingerprint and self._verified.get(mode) == fingerprint:
+            return None
+        images = self._manifest.images(mode)
+        if not images:
+            return None
+
+        now = time.monotonic()
+        if now - self._stale_since.setdefault(mode, now) > self.cfg.max_stale:
+            return None
+
+        self._revalidate(data_provider, mode, fingerprint)
+        self.metrics.incr(mode, "hit_stale")
+        return RenderResult(images, [])
+
+    def _revalidate(
+        self,
+        data_provider: DataProvider,
+        mode: str,
+        fingerprint: str | None,
+    ):
+        """后台刷新静态菜单 (同一模式同时只有一个)，完成后原子切换到新版本"""
+        task = self._revalidating.get(mode)
+        if task is not None and not task.done():
+            return
+
+        async def run():
+            _, error = await self.render(
+                data_provider, mode, None, fingerprint, allow_stale=False
+            )
+            if error:
+                logger.warning(f"[HelpTypst] 后台刷新 {mode} 菜单未完成: {error}")
+
+        self._revalidating[mode] = asyncio.create_task(run())
+
+    @staticmethod
+    def _metric_name(mode: str, query: str | None) -> str:
+        """指标分组：静态菜单与搜索分开统计"""
+        return f"{mode}_search" if query else mode
+
+    async def _traced_render(
+        self,
+        data_provider: DataProvider,
+        mode: str,
+        query: str | None,
+        fingerprint: str | None,
+    ) -> tuple[RenderResult | None, str]:
+        with self.metrics.timer(self._metric_name(mode, query), "total"):
+            return await self._render(data_provider, mode, query, fingerprint)
+
+    async def _render(
+        self,
+        data_provider: DataProvider,
+        mode: str,
+        query: str | None,
+        fingerprint: str | None,
     ) -> tuple[RenderResult | None, str]:
         """核心渲染流程"""
+        metric = self._metric_name(mode, query)
+
         # 1. 确定路径策略
         paths = self._resolve_paths(mode, query)
-        json_path, img_path, hash_path = paths["json"], paths["img"], paths["hash"]
+        stem = paths["stem"]
         is_temp, req_id = paths["is_temp"], paths["req_id"]
 
+        # 本次编译写入的产物 stem (静态菜单为新版本，发布前不影响读者)
+        out_stem: str | None = None
+
+        # 指纹快速通道 (静态)：注册表未变 → 仅需确认文件仍在
+        if not is_temp and fingerprint and self._verified.get(mode) == fingerprint:
+            cached_webps = self._manifest.images(mode)
+            if cached_webps:
+                self.metrics.incr(metric, "hit_fingerprint")
+                return RenderResult(cached_webps, []), ""
+            self._verified.pop(mode, None)
+
+        # 指纹快速通道 (搜索)
+        alias_key = None
+        if is_temp and query:
+            # 负缓存：近期确认无结果的搜索，跳过分析
+            if self._search_cache.is_known_empty(mode, query, fingerprint):
+                self.metrics.incr(metric, "hit_negative")
+                return None, "没有可显示的内容"
+            if fingerprint:
+                alias_key = self._search_cache.make_key(
+                    mode, query, f"fp:{fingerprint}", self._get_config_snapshot()
+                )
+                cached_images = self._search_cache.get(alias_key)
+                if cached_images:
+                    self.metrics.incr(metric, "hit_fingerprint")
+                    return RenderResult(cached_images, []), ""
+
         # 2. 获取锁 (仅静态模式需要)
+        # 进程内 asyncio 锁 + 跨进程文件锁：共享 data_dir 的实例之间每个菜单只渲染一次
         lock = self._cache_locks.get(mode) if not is_temp else None
+        file_lock = FileLock(self._lock_path(stem)) if lock else None
+        if not is_temp:
+            self._verified.pop(mode, None)
 
         try:
-            async with lock or AsyncNullContext():
-                # --- 1. 数据生成 ---
+            waited = time.perf_counter()
+            async with lock or AsyncNullContext(), file_lock or AsyncNullContext():
+                if lock:
+                    self.metrics.observe(
+                        metric, "lock_wait", time.perf_counter() - waited
+                    )
+
+                # --- 1. 数据生成 (内存中的紧凑 JSON) ---
+                timings: dict[str, float] = {}
                 try:
-                    count = await asyncio.wait_for(
-                        asyncio.to_thread(data_provider, json_path),
+                    json_str = await asyncio.wait_for(
+                        asyncio.to_thread(data_provider, timings),
                         timeout=self.cfg.timeout_analysis,
                     )
                 except asyncio.TimeoutError:
-                    if is_temp and json_path.exists():
-                        json_path.unlink(missing_ok=True)
+                    self.metrics.incr(metric, "timeout")
                     return None, "数据分析超时，请检查插件列表是否过长"
-
-                if count == 0:
-                    if is_temp and json_path.exists():
-                        json_path.unlink(missing_ok=True)
+                # 线程已结束，回到事件循环再登记
+                for stage, seconds in timings.items():
+                    self.metrics.observe(metric, stage, seconds)
+
+                if not json_str:
+                    self.metrics.incr(metric, "empty")
+                    if is_temp and query:
+                        self._search_cache.mark_empty(mode, query, fingerprint)
                     return None, "没有可显示的内容"
 
-                # --- 2. 缓存校验 (仅静态) ---
-                need_compile = True
-                if not is_temp and json_path.exists():
-                    # hash + config 双校验
-                    need_compile = await self._check_cache(
-                        json_path, hash_path, img_path
+                # 内容 Hash 只计算一次
+                content_hash = calculate_hash(json_str)
+
+                # --- 搜索结果缓存 (仅搜索) ---
+                search_key = None
+                if is_temp and query:
+                    search_key = self._search_cache.make_key(
+                        mode, query, content_hash, self._get_config_snapshot()
                     )
+                    if alias_key:
+                        self._search_cache.link(alias_key, search_key)
+                    cached_images = self._search_cache.get(search_key)
+                    if cached_images:
+                        self.metrics.incr(metric, "hit_search")
+                        return RenderResult(cached_images, []), ""
 
-                if not need_compile:
-                    cached_webps = self._find_cached_webps(img_path.stem)
+                # --- 2. 缓存校验 (仅静态) ---
+                if not is_temp:
+                    # hash + config 双校验
+                    cached_webps = self._check_cache(mode, content_hash)
                     if cached_webps:
+                        self._mark_verified(mode, fingerprint)
+                        self.metrics.incr(metric, "hit_content")
                         return RenderResult(cached_webps, []), ""
-                    else:
-                        need_compile = True
 
-                # --- 3. Typst 编译 ---
-                if need_compile:
-                    json_str = await asyncio.to_thread(
-                        json_path.read_text, encoding="utf-8"
-                    )
+                    # 其他节点 / 早先版本已渲染过相同内容
+                    if self._store is not None:
+                        cached_webps = await self._restore(
+                            mode, stem, content_hash, fingerprint
+                        )
+                        if cached_webps:
+                            self.metrics.incr(metric, "hit_store")
+                            return RenderResult(cached_webps, []), ""
 
-                    # 构造 DTO
-                    task = RenderTask(
-                        template_path=str(self.template_path),
-                        font_paths=[str(self.font_dir)],
-                        json_str=json_str,
-                        output_png_path=str(img_path),
-                        output_dir=str(self.data_dir),
-                        timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
-                        query=query,
-                        is_temp=is_temp,
-                        req_id=req_id,
-                        webp_limit=self.cfg.webp_limit,
-                        split_height=self.cfg.split_height,
-                        ppi=self.cfg.ppi,
+                # --- 3. Typst 编译 ---
+                self.metrics.incr(metric, "miss")
+                # 静态菜单写入新版本，旧版本在发布前持续可读
+                out_stem = stem if is_temp else self._new_stem(stem)
+
+                # 静态菜单可走卡片片段缓存，只编译变动的卡片
+                use_fragments = not is_temp and self.cfg.fragment_cache
+
+                # 分片并行编译 (仅多进程且存在巨型块时拆分)
+                shards = [json_str]
+                if (
+                    not use_fragments
+                    and self.cfg.shard_compile
+                    and self.cfg.max_concurrent_tasks > 1
+                ):
+                    shards = await asyncio.to_thread(
+                        TypstLayout.shard_layout,
+                        json_str,
+                        self.cfg.max_concurrent_tasks,
                     )
 
-                    # 调度执行
-                    with ProcessPoolExecutor(max_workers=1) as temp_pool:
-                        final_images = await asyncio.get_running_loop().run_in_executor(
-                            temp_pool, execute_render_task, task
+                # 构造 DTO
+                task = RenderTask(
+                    template_path=str(self.template_path),
+                    font_paths=[str(self.font_dir)],
+                    json_str=json_str,
+                    output_dir=str(self.data_dir),
+                    stem_name=out_stem,
+                    timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
+                    query=query,
+                    is_temp=is_temp,
+                    req_id=req_id,
+                    webp_limit=self.cfg.webp_limit,
+                    split_height=self.cfg.split_height,
+                    ppi=self.cfg.ppi,
+                    webp_quality=self.cfg.webp_quality,
+                    webp_method=self.cfg.webp_method,
+                    webp_lossless=self.cfg.webp_lossless,
+                    measure_cards=not is_temp and self.heights is not None,
+                    # 每个 worker 各自开编码线程，按并发数均分 CPU 核数
+                    encode_workers=max(
+                        1,
+                        (os.cpu_count() or 1)
+                        // max(1, self.cfg.max_concurrent_tasks),
+                    ),
+                    # 片段 / 分片结果需拼接，与分页互斥
+                    page_height=(
+                        self.cfg.split_height * 72 / self.cfg.ppi
+                        if self.cfg.paginate
+                        and not use_fragments
+                        and len(shards) == 1
+                        else None
+                    ),
+                )
+
+                # 调度执行
+                plan = None
+                try:
+                    if use_fragments:
+                        if self._fragments is None:
+                            self._fragments = FragmentCache(
+                                root=self.data_dir / InternalCFG.FRAGMENT_DIR,
+                                template_path=self.template_path,
+                                grace=max(
+                                    self.cfg.timeout_compile,
+                                    InternalCFG.ARTIFACT_RETIRE_DELAY,
+                                ),
+                            )
+                        plan = await asyncio.to_thread(
+                            self._fragments.plan, json_str, self.cfg.ppi
+                        )
+                        logger.debug(
+                            f"[HelpTypst] 卡片片段: 需编译 {len(plan.missing)} 张"
+                        )
+                        output = await self._run_in_pool(
+                            metric, execute_fragment_task, task, plan
+                        )
+                    elif len(shards) > 1:
+                        output = await self._run_sharded(metric, task, shards)
+                    else:
+                        output = await self._run_in_pool(
+                            metric, execute_render_task, task
                         )
+                except asyncio.TimeoutError:
+                    self.metrics.incr(metric, "timeout")
+                    self._remove_artifacts(out_stem)
+                    hint = (
+                        "请尝试缩小搜索范围"
+                        if query
+                        else "请稍后重试或调高编译超时时间"
+                    )
+                    return None, (
+                        f"渲染超时 (>{self.cfg.timeout_compile:g}s)，"
+                        f"已终止本次编译，{hint}"
+                    )
 
-                    # 错误检查
-                    if final_images and final_images[0].startswith("ERROR:"):
-                        raise RuntimeError(final_images[0])
+                # 错误检查
+                if output.error:
+                    raise RuntimeError(output.error)
 
-                    if not final_images:
-                        return None, "渲染未生成图片文件"
+                final_images = output.images
+                if not final_images:
+                    return None, "渲染未生成图片文件"
 
-                    # --- 4. 缓存写入 ---
-                    if not is_temp and hash_path:
-                        new_content_hash = calculate_hash(json_str)
-                        current_config_snapshot = self._get_config_snapshot()
+                self.metrics.observe(
+                    metric,
+                    OUTPUT_BYTES,
+                    sum(Path(p).stat().st_size for p in final_images),
+                )
 
-                        meta_data = {
-                            "content_hash": new_content_hash,
-                            "config": current_config_snapshot,
-                        }
+                if plan is not None and self._fragments is not None:
+                    await asyncio.to_thread(self._fragments.commit, mode, plan)
 
-                        await asyncio.to_thread(
-                            hash_path.write_text,
-                            json.dumps(meta_data, ensure_ascii=False),
-                            encoding="utf-8",
-                        )
+                if output.card_heights:
+                    await asyncio.to_thread(
+                        self._record_heights, output.card_heights, mode
+                    )
 
-                    # --- 5. 清理 ---
-                    files_to_clean = []
-                    if is_temp:
-                        files_to_clean.extend([json_path, img_path])
+                # --- 4. 缓存写入 (清单原子替换 = 发布新版本) ---
+                if not is_temp:
+                    await self._publish(
+                        mode, content_hash, out_stem, final_images, fingerprint
+                    )
+                    if self._store is not None:
+                        await self._save_to_store(mode, content_hash, final_images)
+
+                # --- 5. 清理 ---
+                files_to_clean = []
+                if is_temp:
+                    # 未进入搜索缓存的结果随临时文件一起清理
+                    if not (
+                        search_key
+                        and self._search_cache.put(search_key, final_images)
+                    ):
                         files_to_clean.extend([Path(p) for p in final_images])
 
-                    return RenderResult(final_images, files_to_clean), ""
+                return RenderResult(final_images, files_to_clean), ""
 
         except Exception as e:
             logger.error(f"[HelpTypst] Render Error: {e}", exc_info=True)
+            self.metrics.incr(metric, "error")
 
-            if is_temp:
-                try:
-                    if json_path.exists():
-                        json_path.unlink()
-                    if img_path.exists():
-                        img_path.unlink()
-                except Exception:
-                    pass
-
-            if not is_temp and hash_path and hash_path.exists():
-                hash_path.unlink()
+            # 只清理本次写入的版本；已发布的静态菜单保持可用
+            published = self._manifest.get(mode)
+            if out_stem and not (published and published.stem == out_stem):
+                self._remove_artifacts(out_stem)
 
             return None, f"渲染过程出错: {str(e)}"
 
@@ -184,80 +813,28 @@ class TypstRenderer:
         if query:
             uid = str(uuid.uuid4())
             return {
-                "json": self.data_dir / f"temp_{uid}.json",
-                "img": self.data_dir / f"temp_{uid}.png",
-                "hash": None,
+                "stem": f"{InternalCFG.SEARCH_FILE_PREFIX}{uid}",
                 "is_temp": True,
                 "req_id": uid,
             }
         else:
             base_name = InternalCFG.CACHE_FILES.get(mode, "cache_unknown")
             return {
-                "json": self.data_dir / f"{base_name}.json",
-                "img": self.data_dir / f"{base_name}.png",
-                "hash": self.data_dir / f"{base_name}.hash",
+                "stem": base_name,
                 "is_temp": False,
                 "req_id": "static",
             }
 
-    def _find_cached_webps(self, stem: str) -> list[str]:
-        p1 = self.data_dir / f"{stem}.webp"
-        if p1.exists():
-            return [str(p1)]
-
-        parts = sorted(self.data_dir.glob(f"{stem}_part*.webp"), key=lambda x: x.name)
-        return [str(p) for p in parts] if parts else []
-
-    async def _check_cache(
-        self, json_path: Path, hash_path: Path, img_path: Path
-    ) -> bool:
-        """检查是否需要重新编译"""
-        try:
-            # 1. 计算当前 Hash
-            json_content = await asyncio.to_thread(
-                json_path.read_text, encoding="utf-8"
-            )
-            current_content_hash = calculate_hash(json_content)
-
-            # 2. 读缓存
-            if not hash_path.exists():
-                return True
-            cached_data_str = await asyncio.to_thread(
-                hash_path.read_text, encoding="utf-8"
-            )
-
-            # 3. 解析缓存
-            try:
-                cached_meta = json.loads(cached_data_str)
-                cached_content_hash = cached_meta.get("content_hash")
-                cached_config = cached_meta.get("config", {})
-            except json.JSONDecodeError:
-                # 兼容性处理
-                cached_content_hash = cached_data_str.strip()
-                cached_config = {}
-
-            # 4. 当前配置快照
-            current_config = self._get_config_snapshot()
-
-            # 5. 图片完整性校验
-            is_img_valid = False
-            if img_path.exists():
-                is_img_valid = await asyncio.to_thread(verify_image_header, img_path)
-
-            # 6. 比对：内容一致 AND 配置一致 AND 图片有效
-            if (
-                cached_content_hash == current_content_hash
-                and cached_config == current_config
-                and is_img_valid
-            ):
+    def _check_cache(self, mode: str, content_hash: str) -> list[str] | None:
+        """缓存校验：内容一致 AND 配置一致 AND 产物完整，命中时返回图片路径"""
+        entry = self._manifest.get(mode)
+        if entry is None:
+            return None
+        config_match = entry.config == self._get_config_snapshot()
+        if entry.content_hash == content_hash and config_match:
+            images = self._manifest.images(mode)
+            if images:
                 logger.debug("[HelpTypst] 缓存命中 (Content + Config)。")
-                return False  # 不需要编译
-
-            logger.debug(
-                f"[HelpTypst] 缓存失效。ConfigMatch={cached_config == current_config}"
-            )
-            return True
-
-        except Exception as e:
-            logger.warning(f"[HelpTypst] 缓存校验异常，强制重绘: {e}")
-            return True
+                return images
+        logger.debug(f"[HelpTypst] 缓存失效。ConfigMatch={config_match}")
+        return None
@@ -0,0 +1,102 @@
+from collections import defaultdict
+from dataclasses import replace
+
+from ..domain import LiteNode, LitePlugin
+
+# 倒排索引的 n-gram 长度；更短的查询退化为扫描预先小写化的文本
+NGRAM = 3
+
+
+class SearchIndex:
+    """单次分析结果的搜索索引
+
+    - 每个容器(插件/分类组)与节点展平为一个条目，字段预先小写化
+    - n-gram 倒排索引: gram → 条目编号集合
+    - 条目路径: (插件序号, 子节点序号, ...)，用于回溯祖先
+    """
+
+    def __init__(self, plugins: list[LitePlugin]):
+        self.plugins = plugins
+        self._texts: list[str] = []
+        self._paths: list[tuple[int, ...]] = []
+        self._grams: dict[str, set[int]] = defaultdict(set)
+
+        for p_idx, p in enumerate(plugins):
+            self._add((p_idx,), p.name, p.display_name, p.desc)
+            self._add_nodes(p.nodes, (p_idx,))
+
+    def _add_nodes(self, nodes: list[LiteNode], prefix: tuple[int, ...]):
+        for i, node in enumerate(nodes):
+            path = prefix + (i,)
+            self._add(path, node.name, None, node.desc)
+            if node.children:
+                self._add_nodes(node.children, path)
+
+    def _add(self, path: tuple[int, ...], *fields: str | None):
+        # \0 分隔，保证子串不会跨字段匹配
+        text = "\0".join(f.lower() for f in fields if f)
+        entry_id = len(self._texts)
+        self._texts.append(text)
+        self._paths.append(path)
+        for i in range(len(text) - NGRAM + 1):
+            self._grams[text[i : i + NGRAM]].add(entry_id)
+
+    def _candidates(self, q: str) -> list[int]:
+        if len(q) < NGRAM:
+            return [i for i, t in enumerate(self._texts) if q in t]
+
+        postings = []
+        for i in range(len(q) - NGRAM + 1):
+            ids = self._grams.get(q[i : i + NGRAM])
+            if not ids:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        hits = set.intersection(*postings)
+        # n-gram 命中只是必要条件，仍需子串确认
+        return sorted(i for i in hits if q in self._texts[i])
+
+    def search(self, query: str) -> list[LitePlugin]:
+        """返回剪枝后的插件列表
+
+        匹配规则与逐项扫描一致：容器匹配 → 保留整个容器；节点匹配 → 保留该节点
+        及其全部子节点；未匹配节点仅在有后代匹配时保留 (子节点剪枝)。
+        未被修改的子树直接复用原对象，只对祖先路径做浅拷贝。
+        """
+        matched = {self._paths[i] for i in self._candidates(query.lower())}
+        if not matched:
+            return []
+
+        # 前缀 → 需要保留的子节点序号
+        keep: dict[tuple[int, ...], set[int]] = defaultdict(set)
+        for path in matched:
+            for depth in range(1, len(path)):
+                keep[path[:depth]].add(path[depth])
+
+        results = []
+        for p_idx in sorted({path[0] for path in matched}):
+            plugin = self.plugins[p_idx]
+            if (p_idx,) in matched:
+                results.append(plugin)
+            else:
+                nodes = self._prune(plugin.nodes, (p_idx,), matched, keep)
+                results.append(replace(plugin, nodes=nodes))
+        return results
+
+    def _prune(
+        self,
+        nodes: list[LiteNode],
+        prefix: tuple[int, ...],
+        matched: set[tuple[int, ...]],
+        keep: dict[tuple[int, ...], set[int]],
+    ) -> list[LiteNode]:
+        result = []
+        for i in sorted(keep.get(prefix, ())):
+            node = nodes[i]
+            path = prefix + (i,)
+            if path in matched:
+                result.append(node)
+            else:
+                children = self._prune(node.children, path, matched, keep)
+                result.append(replace(node, children=children))
+        return result
@@ -0,0 +1,292 @@
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import urlparse
+
+from astrbot.api import logger
+
+from ..domain import InternalCFG
+from ..utils import PluginConfig
+
+
+class RenderStore(ABC):
+    """渲染产物存储：按 key (内容 Hash + 配置快照 + 模板版本) 存取整组 WebP 分片
+
+    渲染结果是 key 的纯函数，插件集合相同的节点可共用同一份存储，互相复用图片。
+    条目在最近一次访问后 ttl 秒过期，总字节数超过 max_bytes 时淘汰最久未访问的条目。
+    """
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @abstractmethod
+    def get(self, key: str) -> list[bytes] | None:
+        """取回分片 (按顺序)，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    def put(self, key: str, chunks: list[bytes]):
+        """登记分片，并按 TTL / 容量淘汰旧条目"""
+
+    def close(self):
+        pass
+
+
+class FileSystemStore(RenderStore):
+    """目录存储：每个 key 一个子目录，分片按序号命名，目录 mtime 即最近访问时间
+
+    未指定目录时位于 data_dir 下；指向多个节点共享的目录 (NFS / SMB 等) 即可跨节点复用。
+    写入先落临时目录再整体改名，读者不会看到不完整的条目。
+    """
+
+    def __init__(self, root: Path, ttl: float, max_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> list[bytes] | None:
+        entry = self.root / key
+        try:
+            if time.time() - entry.stat().st_mtime > self.ttl:
+                # 过期条目直接淘汰，不必等下一次写入
+                shutil.rmtree(entry, ignore_errors=True)
+                return None
+            files = sorted(entry.glob("*.webp"), key=lambda p: int(p.stem))
+            chunks = [p.read_bytes() for p in files]
+            # 刷新访问时间
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return chunks or None
+
+    def put(self, key: str, chunks: list[bytes]):
+        entry = self.root / key
+        if entry.exists():
+            os.utime(entry)
+            return
+        tmp = self.root / f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        tmp.mkdir()
+        try:
+            for i, chunk in enumerate(chunks):
+                (tmp / f"{i}.webp").write_bytes(chunk)
+            # 其他节点已写入同一 key 时改名失败，保留先到者
+            os.replace(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for entry in self.root.iterdir():
+            try:
+                mtime = entry.stat().st_mtime
+                if entry.name.startswith("."):
+                    # 写入中途退出遗留的临时目录
+                    if now - mtime > InternalCFG.ARTIFACT_RETIRE_DELAY:
+                        shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                if now - mtime > self.ttl:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    continue
+                size = sum(f.stat().st_size for f in entry.iterdir())
+            except OSError:
+                continue
+            entries.append((mtime, size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+class _RespClient:
+    """最小 Redis 协议 (RESP2) 客户端：单连接，多线程调用时串行"""
+
+    def __init__(self, url: str, timeout: float = 5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = parsed.username
+        self.password = parsed.password
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._reader = None
+
+    def execute(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._call(*args)
+            except (OSError, ConnectionError):
+                # 断线后丢弃连接，下次调用重连 (不自动重试，避免重复写入)
+                self._close()
+                raise
+
+    def transaction(self, *commands: tuple) -> list:
+        """MULTI/EXEC 执行一组命令：整体生效，其他连接看不到中间状态"""
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._call("MULTI")
+                for command in commands:
+                    self._call(*command)
+                return self._call("EXEC")
+            except Exception:
+                # 事务中途出错时连接停在 MULTI 状态 / 响应未读完，丢弃连接 (服务端随之放弃事务)
+                self._close()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            auth = [self.username] if self.username else []
+            self._call("AUTH", *auth, self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                self._reader.close()
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis 连接已断开")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redis 错误: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            return self._reader.read(size + 2)[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise ConnectionError(f"无法解析的 Redis 响应: {line!r}")
+
+
+class RedisStore(RenderStore):
+    """Redis 协议存储 (Redis / Valkey / KeyDB 等)，供多个节点共享
+
+    - {prefix}:{key}: 分片列表，EXPIRE 即 TTL (每次命中续期)
+    - {prefix}:atime / {prefix}:size: 各条目最近访问时间与字节数，用于容量淘汰
+    """
+
+    PREFIX: str = "helptypst"
+
+    def __init__(self, url: str, ttl: float, max_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self._client = _RespClient(url)
+        self._atime = f"{self.PREFIX}:atime"
+        self._size = f"{self.PREFIX}:size"
+
+    def _key(self, key: str) -> str:
+        return f"{self.PREFIX}:{key}"
+
+    def get(self, key: str) -> list[bytes] | None:
+        chunks = self._client.execute("LRANGE", self._key(key), 0, -1)
+        if not chunks:
+            # 已过期或被服务端淘汰
+            self._forget(key)
+            return None
+        self._client.execute("EXPIRE", self._key(key), int(self.ttl))
+        self._client.execute("ZADD", self._atime, time.time(), key)
+        return chunks
+
+    def put(self, key: str, chunks: list[bytes]):
+        name = self._key(key)
+        # 同一事务内替换：其他节点不会读到空列表而误删条目
+        self._client.transaction(
+            ("DEL", name),
+            ("RPUSH", name, *chunks),
+            ("EXPIRE", name, int(self.ttl)),
+            ("ZADD", self._atime, time.time(), key),
+            ("HSET", self._size, key, sum(map(len, chunks))),
+        )
+        self._evict()
+
+    def _forget(self, key: str):
+        self._client.execute("DEL", self._key(key))
+        self._client.execute("ZREM", self._atime, key)
+        self._client.execute("HDEL", self._size, key)
+
+    def _evict(self):
+        expired = self._client.execute(
+            "ZRANGEBYSCORE", self._atime, "-inf", time.time() - self.ttl
+        )
+        for key in expired or []:
+            self._forget(key.decode())
+
+        total = sum(int(v) for v in self._client.execute("HVALS", self._size) or [])
+        while total > self.max_bytes:
+            oldest = self._client.execute("ZRANGE", self._atime, 0, 0)
+            if not oldest:
+                break
+            key = oldest[0].decode()
+            size = self._client.execute("HGET", self._size, key)
+            self._forget(key)
+            total -= int(size or 0)
+
+    def close(self):
+        self._client.close()
+
+
+def create_store(config: PluginConfig, data_dir: Path) -> RenderStore | None:
+    """按配置创建渲染产物存储；off 或容量 / 有效期为 0 时关闭"""
+    if (
+        config.cache_store == "off"
+        or config.cache_store_mb <= 0
+        or config.cache_store_ttl <= 0
+    ):
+        return None
+    ttl = config.cache_store_ttl * 3600
+    max_bytes = config.cache_store_mb * 1024 * 1024
+    uri = config.cache_store_uri.strip()
+
+    if config.cache_store == "redis":
+        return RedisStore(uri or "redis://127.0.0.1:6379/0", ttl, max_bytes)
+    if config.cache_store != "filesystem":
+        logger.warning(
+            f"[HelpTypst] 未知的渲染产物存储 {config.cache_store}，改用 filesystem"
+        )
+    root = Path(uri) if uri else data_dir / InternalCFG.STORE_DIR
+    try:
+        return FileSystemStore(root, ttl, max_bytes)
+    except OSError as e:
+        logger.warning(f"[HelpTypst] 渲染产物存储目录不可用 {root}: {e}")
+        return None
@@ -0,0 +1,83 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from astrbot.api import logger
+
+
+class MenuWarmer:
+    """后台预渲染：启动后及插件变动后重建静态菜单缓存
+
+    插件加载/卸载/启停都会改变注册表指纹，因此只需轮询各模式的指纹；
+    指纹在 debounce 秒内保持稳定后才重建，启动时成批的加载事件只触发一次。
+    只重建指纹变化的模式 (如仅某一菜单的卡片实测高度有更新)。
+    """
+
+    def __init__(
+        self,
+        render_fn: Callable[[str], Awaitable[None]],
+        fingerprint_fn: Callable[[str], str],
+        modes: list[str],
+        debounce: float,
+        poll_interval: float,
+    ):
+        self.render_fn = render_fn
+        self.fingerprint_fn = fingerprint_fn
+        self.modes = modes
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._rendered_fp: dict[str, str] = {}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def trigger(self):
+        """外部事件提示 (如 AstrBot 加载完成)，立即检查一次指纹"""
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                fps = self._fingerprints()
+                if fps != self._rendered_fp:
+                    fps = await self._wait_stable(fps)
+                    for mode in self.modes:
+                        if fps[mode] != self._rendered_fp.get(mode):
+                            await self.render_fn(mode)
+                    # 渲染前的指纹：渲染中回读的新高度会改变指纹，下一轮只重排对应模式
+                    self._rendered_fp = fps
+                    logger.debug("[HelpTypst] 静态菜单预渲染完成。")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[HelpTypst] 预渲染失败: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _fingerprints(self) -> dict[str, str]:
+        return {mode: self.fingerprint_fn(mode) for mode in self.modes}
+
+    async def _wait_stable(self, fps: dict[str, str]) -> dict[str, str]:
+        """防抖：等待指纹连续 debounce 秒不变"""
+        while True:
+            await asyncio.sleep(self.debounce)
+            latest = self._fingerprints()
+            if latest == fps:
+                return fps
+            fps = latest
@@ -1,14 +1,26 @@
 import ctypes
 import gc
+import json
 import platform
 import re
+import time
 import traceback
-from dataclasses import dataclass
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 
 import typst
+from astrbot.api import logger
 
-from ..utils import process_image_to_webp
+from ..domain import InternalCFG
+from ..utils import (
+    atomic_write,
+    composite_cards,
+    process_image_to_webp,
+    process_pages_to_webp,
+    stitch_vertical,
+)
 
 
 def force_memory_release():
@@ -23,13 +35,106 @@ def force_memory_release():
         except Exception:
             pass
 
+
+# 进程内常驻编译器: (模板路径, 字体目录) → Compiler
+_COMPILERS: dict[tuple[str, tuple[str, ...]], typst.Compiler] = {}
+
+# typst-py >= 0.14 支持按次传入 sys_inputs，旧版本只能在构造时绑定
+_PER_CALL_INPUTS = "sys_inputs" in (
+    getattr(typst.Compiler.compile, "__text_signature__", None) or ""
+)
+_fallback_warned = False
+
+
+def _warn_fallback():
+    """旧版 typst-py 无法复用常驻编译器，每个 worker 只提示一次"""
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning(
+            "[HelpTypst] typst-py 版本过旧 (需 >=0.14,<0.15)，"
+            "无法复用常驻编译器，已退化为一次性编译。"
+        )
+
+
+def get_compiler(template_path: str, font_paths: list[str]) -> typst.Compiler:
+    """获取（或创建）绑定到模板与字体目录的常驻编译器"""
+    key = (template_path, tuple(font_paths))
+    compiler = _COMPILERS.get(key)
+    if compiler is None:
+        compiler = typst.Compiler(template_path, font_paths=list(font_paths))
+        _COMPILERS[key] = compiler
+    return compiler
+
+
+def compile_template(
+    template_path: str,
+    font_paths: list[str],
+    sys_inputs: dict[str, str],
+    ppi: float,
+    output: str | None = None,
+    fmt: str = "png",
+):
+    """编译模板：复用常驻编译器，仅替换 sys_inputs
+
+    output 为 None 时不落盘，直接返回图片字节 (多页时为每页一份的列表)
+    """
+    if not _PER_CALL_INPUTS:
+        # 旧版 typst-py 退化为一次性编译
+        _warn_fallback()
+        return typst.compile(
+            template_path,
+            output=output,
+            font_paths=font_paths,
+            format=fmt,
+            ppi=ppi,
+            sys_inputs=sys_inputs,
+        )
+
+    compiler = get_compiler(template_path, font_paths)
+    return compiler.compile(
+        output=output, format=fmt, ppi=ppi, sys_inputs=sys_inputs
+    )
+
+
+def query_card_heights(
+    template_path: str, font_paths: list[str], sys_inputs: dict[str, str]
+) -> list[dict]:
+    """回读瀑布流卡片的实测尺寸 [{id, width, height}] (pt)
+
+    常驻编译器沿用最近一次编译的输入与缓存，须紧随同一输入的 compile 调用
+    """
+    if _PER_CALL_INPUTS:
+        raw = get_compiler(template_path, font_paths).query(
+            "<card-height>", field="value"
+        )
+    else:
+        raw = typst.query(
+            template_path,
+            "<card-height>",
+            field="value",
+            font_paths=font_paths,
+            sys_inputs=sys_inputs,
+        )
+    return json.loads(raw)
+
+
+def warmup_worker(template_path: str, font_paths: list[str]) -> bool:
+    """进程池预热：拉起子进程，预建编译器（解析模板 + 扫描字体）"""
+    if _PER_CALL_INPUTS:
+        get_compiler(template_path, font_paths)
+    else:
+        _warn_fallback()
+    return True
+
+
 @dataclass
 class RenderTask:
     template_path: str
     font_paths: list[str]
     json_str: str
-    output_png_path: str
     output_dir: str
+    stem_name: str
     timestamp: str
     query: str | None
     is_temp: bool
@@ -37,44 +142,222 @@ class RenderTask:
     webp_limit: int
     split_height: int
     ppi: float
+    webp_quality: int = 80
+    webp_method: int = 6
+    webp_lossless: bool = False
+    page_height: float | None = None  # 分页模式页高 (pt)，None 为整张长图
+    measure_cards: bool = False  # 编译后回读瀑布流卡片实测高度
+    encode_workers: int | None = None  # 分片编码线程数 (各 worker 均分 CPU 核数)
+
+
+@dataclass
+class FragmentPlan:
+    """卡片片段渲染计划: 缺失卡片与页首/页尾一次编译，其余复用缓存"""
+
+    fragment_dir: str
+    doc_json: str  # 片段模式布局: 首页为页首，随后每页一张缺失卡片，末页为页尾
+    missing: list[str]  # 缺失卡片的 key，与文档中的卡片页一一对应
+    giants: list[str]
+    columns: list[list[str]]
+    column_pitch: float  # 相邻两列左边缘的距离 (pt)
+
+
+@dataclass
+class RenderOutput:
+    """子进程渲染结果"""
+
+    images: list[str] = field(default_factory=list)
+    error: str | None = None  # 子进程内异常的 traceback
+    started_at: float = 0.0  # 子进程开始执行的时间 (time.time())，用于计算派发耗时
+    timings: dict[str, float] = field(default_factory=dict)  # 子进程内各阶段耗时 (秒)
+    card_heights: list[dict] = field(default_factory=list)  # 卡片实测尺寸 (pt)
+
+
+@contextmanager
+def _stage(out: RenderOutput, name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        out.timings[name] = out.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _build_sys_inputs(task: RenderTask) -> dict[str, str]:
+    sys_inputs = {
+        "json_string": task.json_str,
+        "timestamp": task.timestamp,
+    }
+    if task.query:
+        sys_inputs["query_regex"] = re.escape(task.query)
+    return sys_inputs
 
-def execute_render_task(task: RenderTask) -> list[str]:
+
+def execute_render_task(task: RenderTask) -> RenderOutput:
     """渲染子进程"""
+    out = RenderOutput(started_at=time.time())
     try:
         # 1. 准备参数
-        sys_inputs = {
-            "json_string": task.json_str,
-            "timestamp": task.timestamp,
-        }
-        if task.query:
-            sys_inputs["query_regex"] = re.escape(task.query)
-
-        # 2. 执行 Typst 编译
-        typst.compile(
+        sys_inputs = _build_sys_inputs(task)
+
+        # 2. 执行 Typst 编译 (常驻编译器，增量缓存复用；PNG 只存在于内存)
+        with _stage(out, "compile"):
+            if task.page_height:
+                # 模板在布局阶段自行判断：放得进一页时自适应页高，否则按卡片边界分页
+                sys_inputs["page_height"] = f"{task.page_height:.2f}"
+            output = compile_template(
+                task.template_path,
+                task.font_paths,
+                sys_inputs,
+                ppi=task.ppi,
+            )
+            # 多页文档返回每页一份 PNG 字节
+            pages = output if isinstance(output, list) else [output]
+            paginated = len(pages) > 1
+
+        if task.measure_cards:
+            with _stage(out, "measure"):
+                out.card_heights = query_card_heights(
+                    task.template_path, task.font_paths, sys_inputs
+                )
+
+        # 3. 调用图片处理 (仅 WebP 落盘)
+        with _stage(out, "encode"):
+            if paginated:
+                out.images = process_pages_to_webp(
+                    pages=pages,
+                    output_dir=task.output_dir,
+                    stem_name=task.stem_name,
+                    trim_margin=round(InternalCFG.PAGE_MARGIN_PT * task.ppi / 72),
+                    quality=task.webp_quality,
+                    method=task.webp_method,
+                    lossless=task.webp_lossless,
+                    workers=task.encode_workers,
+                )
+            else:
+                out.images = process_image_to_webp(
+                    source=pages[0],
+                    output_dir=task.output_dir,
+                    stem_name=task.stem_name,
+                    webp_limit=task.webp_limit,
+                    split_height=task.split_height,
+                    quality=task.webp_quality,
+                    method=task.webp_method,
+                    lossless=task.webp_lossless,
+                    workers=task.encode_workers,
+                )
+
+    except Exception:
+        out.error = traceback.format_exc()
+
+    finally:
+        # 4. 强制内存回收
+        force_memory_release()
+
+    return out
+
+
+def compile_shard(task: RenderTask) -> tuple[bytes, list[dict]]:
+    """分片编译子进程：只编译本片 (整页高度自适应)，返回 (PNG 字节, 卡片实测尺寸)"""
+    try:
+        sys_inputs = _build_sys_inputs(task)
+        output = compile_template(
             task.template_path,
-            output=task.output_png_path,
-            font_paths=task.font_paths,
-            format="png",
+            task.font_paths,
+            sys_inputs,
             ppi=task.ppi,
-            sys_inputs=sys_inputs
         )
+        heights = []
+        if task.measure_cards:
+            heights = query_card_heights(task.template_path, task.font_paths, sys_inputs)
+        return (output[0] if isinstance(output, list) else output), heights
+    finally:
+        force_memory_release()
 
-        # 3. 调用图片处理
-        # 计算文件名 stem
-        src_path = Path(task.output_png_path)
-        final_stem = f"temp_{task.req_id}" if task.is_temp else src_path.stem
-
-        return process_image_to_webp(
-            source_path=task.output_png_path,
-            output_dir=task.output_dir,
-            stem_name=final_stem,
-            webp_limit=task.webp_limit,
-            split_height=task.split_height
-        )
+
+def _encode_canvas(task: RenderTask, canvas) -> list[str]:
+    return process_image_to_webp(
+        source=canvas,
+        output_dir=task.output_dir,
+        stem_name=task.stem_name,
+        webp_limit=task.webp_limit,
+        split_height=task.split_height,
+        quality=task.webp_quality,
+        method=task.webp_method,
+        lossless=task.webp_lossless,
+        workers=task.encode_workers,
+    )
+
+
+def execute_stitch_task(task: RenderTask, parts: list[bytes]) -> RenderOutput:
+    """拼接子进程：按顺序纵向拼接各分片，再按常规流程切分编码"""
+    out = RenderOutput(started_at=time.time())
+    try:
+        with _stage(out, "composite"):
+            canvas = stitch_vertical(parts)
+        with canvas, _stage(out, "encode"):
+            out.images = _encode_canvas(task, canvas)
 
     except Exception:
-        return [f"ERROR: {traceback.format_exc()}"]
+        out.error = traceback.format_exc()
 
     finally:
-        # 4. 强制内存回收
         force_memory_release()
+
+    return out
+
+
+def execute_fragment_task(task: RenderTask, plan: FragmentPlan) -> RenderOutput:
+    """片段子进程：编译缺失卡片并写入缓存，再拼接整张菜单"""
+    out = RenderOutput(started_at=time.time())
+    try:
+        sys_inputs = _build_sys_inputs(replace(task, json_str=plan.doc_json))
+        with _stage(out, "compile"):
+            output = compile_template(
+                task.template_path,
+                task.font_paths,
+                sys_inputs,
+                ppi=task.ppi,
+            )
+        pages = output if isinstance(output, list) else [output]
+        if len(pages) != len(plan.missing) + 2:
+            raise RuntimeError(
+                f"片段页数不符: 期望 {len(plan.missing) + 2}，实际 {len(pages)}"
+            )
+        header, tail = pages[0], pages[-1]
+
+        # 只有本次编译的缺失卡片带实测值，已缓存的卡片此前已回读过
+        if task.measure_cards and plan.missing:
+            with _stage(out, "measure"):
+                out.card_heights = query_card_heights(
+                    task.template_path, task.font_paths, sys_inputs
+                )
+
+        with _stage(out, "composite"):
+            # Typst 输出的 PNG 原样落盘；先写临时文件再改名，读者不会看到半截文件
+            frag_dir = Path(plan.fragment_dir)
+            for key, png in zip(plan.missing, pages[1:-1]):
+                with atomic_write(frag_dir / f"{key}.png") as tmp:
+                    tmp.write_bytes(png)
+
+            scale = task.ppi / 72
+            canvas = composite_cards(
+                header=header,
+                giants=[frag_dir / f"{k}.png" for k in plan.giants],
+                columns=[[frag_dir / f"{k}.png" for k in col] for col in plan.columns],
+                tail=tail,
+                margin=round(InternalCFG.PAGE_MARGIN_PT * scale),
+                column_pitch=plan.column_pitch * scale,
+                card_gap=round(InternalCFG.CARD_GAP_PT * scale),
+                section_gap=round(InternalCFG.SECTION_GAP_PT * scale),
+                block_spacing=round(InternalCFG.BLOCK_SPACING_PT * scale),
+            )
+        with canvas, _stage(out, "encode"):
+            out.images = _encode_canvas(task, canvas)
+
+    except Exception:
+        out.error = traceback.format_exc()
+
+    finally:
+        force_memory_release()
+
+    return out
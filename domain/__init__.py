@@ -1,4 +1,12 @@
 from .constants import InternalCFG, RenderMode
-from .schemas import PluginMetadata, RenderNode
+from .schemas import LiteNode, LitePlugin, PluginMetadata, RenderNode, lite_text
 
-__all__ = ["RenderNode", "PluginMetadata", "InternalCFG", "RenderMode"]
+__all__ = [
+    "RenderNode",
+    "PluginMetadata",
+    "LiteNode",
+    "LitePlugin",
+    "lite_text",
+    "InternalCFG",
+    "RenderMode",
+]
@@ -24,15 +24,60 @@ class InternalCFG:
     }
 
     # 会引起布局变动的配置项 → 缓存失效
-    CACHE_SENSITIVE_CONFIGS: list[str] = ["giant_threshold", "split_height", "ppi"]
+    CACHE_SENSITIVE_CONFIGS: list[str] = [
+        "giant_threshold",
+        "column_count",
+        "split_height",
+        "ppi",
+        "webp_quality",
+        "webp_method",
+        "webp_lossless",
+        "paginate",
+        "shard_compile",
+        "fragment_cache",
+    ]
 
     # 文件/文件夹名
     NAME_TEMPLATE: str = "base.typ"
     NAME_FONT_DIR: str = "fonts"
 
+    # 模板页面尺寸与间距 (pt)，需与 templates/base.typ 保持一致
+    PAGE_WIDTH_PT: float = 900
+    PAGE_MARGIN_PT: float = 20
+    CARD_GAP_PT: float = 10  # 卡片纵向间距
+    COLUMN_GUTTER_PT: float = 15  # 瀑布流列间距
+    SECTION_GAP_PT: float = 15  # 区块间距 (片段拼接时使用)
+    BLOCK_SPACING_PT: float = 14.4  # Typst 默认块间距 (1.2em @ 12pt)
+
+    # 静态菜单缓存清单 (内容 Hash / 配置快照 / 产物文件)
+    MANIFEST_FILE: str = "cache_manifest.json"
+
+    # 渲染产物存储 (filesystem 后端的默认目录)
+    STORE_DIR: str = "render_store"
+
+    # 旧版本遗留文件 (布局 JSON / .hash 校验文件 / 临时文件)，首次启动时清理
+    LEGACY_FILE_PATTERNS: tuple[str, ...] = ("cache_menu_*.json", "*.hash", "temp_*")
+
+    # 卡片片段缓存目录
+    FRAGMENT_DIR: str = "fragments"
+
+    # 卡片实测高度表
+    HEIGHTS_FILE: str = "card_heights.json"
+
+    # 搜索结果缓存文件前缀
+    SEARCH_FILE_PREFIX: str = "search_"
+
+    # 渲染指标
+    METRICS_FILE: str = "metrics.prom"  # Prometheus 文本格式，供 node_exporter 等采集
+    METRICS_WINDOW: int = 200  # 每项指标保留的最近样本数 (滚动分位数)
+    METRICS_INTERVAL: float = 60  # 指标文件刷新间隔 (秒)
+
     # 时序
     DELAY_SEND: float = 1
-
+    SEARCH_NEGATIVE_TTL: float = 300  # 无结果查询的负缓存有效期 (秒)
+    PRERENDER_DEBOUNCE: float = 5  # 注册表指纹稳定多久后才预渲染 (秒)
+    PRERENDER_POLL_INTERVAL: float = 30  # 注册表指纹轮询间隔 (秒)
+    ARTIFACT_RETIRE_DELAY: float = 30  # 静态菜单旧版本产物的延迟删除时间 (秒)
 
 
 class RenderMode(str, Enum):
@@ -1,3 +1,4 @@
+from dataclasses import dataclass, field
 from typing import Any
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
@@ -65,3 +66,55 @@ class PluginMetadata(BaseModel):
     @classmethod
     def ensure_desc(cls, v: Any) -> str:
         return str(v) if v is not None else ""
+
+
+# === 轻量节点 (分析 → 布局 热路径) ===
+# 与上方 Pydantic 模型字段一一对应，to_dict() 与 model_dump() 输出一致；
+# 不做校验，外部数据的类型收敛由分析器在读取注册表时完成 (见 lite_text)
+
+
+def lite_text(v: Any, default: str = "") -> str:
+    """外部字段 → str (None 取默认值)，等价于模型上的 before 校验器"""
+    return default if v is None else v if isinstance(v, str) else str(v)
+
+
+@dataclass(slots=True)
+class LiteNode:
+    """RenderNode 的轻量版本"""
+
+    name: str
+    desc: str = ""
+    is_group: bool = False
+    tag: str = "normal"
+    priority: int | None = None
+    children: list["LiteNode"] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "desc": self.desc,
+            "is_group": self.is_group,
+            "tag": self.tag,
+            "priority": self.priority,
+            "children": [c.to_dict() for c in self.children],
+        }
+
+
+@dataclass(slots=True)
+class LitePlugin:
+    """PluginMetadata 的轻量版本"""
+
+    name: str
+    display_name: str | None = None
+    version: str | None = None
+    desc: str = ""
+    nodes: list[LiteNode] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "display_name": self.display_name,
+            "version": self.version,
+            "desc": self.desc,
+            "nodes": [n.to_dict() for n in self.nodes],
+        }
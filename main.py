@@ -11,10 +11,15 @@ from .core import (
     CommandAnalyzer,
     EventAnalyzer,
     FilterAnalyzer,
+    MenuWarmer,
+    RegistrySnapshots,
+    RenderResult,
     TypstRenderer,
+    record_stage,
+    registry_fingerprint,
 )
 from .domain import InternalCFG
-from .utils import PluginConfig, TypstLayout
+from .utils import CardHeights, PluginConfig, TypstLayout
 
 
 class HelpTypst(Star):
@@ -33,7 +38,11 @@ class HelpTypst(Star):
         # 3. 视图层
         self.prefixes: list[str] = self.context.get_config().get("wake_prefix", ["/"])
 
-        self.layout = TypstLayout(self.config)
+        # 卡片实测高度 (渲染器回读写入，布局读取)
+        self.heights = CardHeights(
+            path=self.data_dir / InternalCFG.HEIGHTS_FILE, template_path=template_path
+        )
+        self.layout = TypstLayout(self.config, heights=self.heights)
 
         # 4. 渲染引擎配置注入
         self.renderer = TypstRenderer(
@@ -41,57 +50,104 @@ class HelpTypst(Star):
             template_path=template_path,
             font_dir=font_dir,
             config=self.config,
+            heights=self.heights,
         )
 
-        # 5. 分析器
-        self.cmd_analyzer = CommandAnalyzer(context, self.config)
-        self.evt_analyzer = EventAnalyzer(context, self.config)
-        self.flt_analyzer = FilterAnalyzer(context, self.config)
+        # 5. 分析器 (共用注册表快照，同一指纹下只扫描一次)
+        snapshots = RegistrySnapshots(context, self.config)
+        self.cmd_analyzer = CommandAnalyzer(context, self.config, snapshots)
+        self.evt_analyzer = EventAnalyzer(context, self.config, snapshots)
+        self.flt_analyzer = FilterAnalyzer(context, self.config, snapshots)
+
+        # 模式 → (分析器, 标题)
+        self.views: dict[str, tuple[BaseAnalyzer, str]] = {
+            "command": (self.cmd_analyzer, "AstrBot 指令菜单"),
+            "event": (self.evt_analyzer, "AstrBot 事件监听"),
+            "filter": (self.flt_analyzer, "AstrBot 过滤器分析"),
+        }
+
+        # 6. 后台预渲染
+        self.warmer = MenuWarmer(
+            render_fn=self._prerender,
+            fingerprint_fn=self._fingerprint,
+            modes=list(InternalCFG.CACHE_FILES.keys()),
+            debounce=InternalCFG.PRERENDER_DEBOUNCE,
+            poll_interval=InternalCFG.PRERENDER_POLL_INTERVAL,
+        )
 
     async def initialize(self):
-        pass
+        # 常驻渲染进程池
+        self.renderer.start()
+        self.renderer.metrics.start_export(
+            self.data_dir / InternalCFG.METRICS_FILE, InternalCFG.METRICS_INTERVAL
+        )
+        if self.config.prerender:
+            self.warmer.start()
+
+    @filter.on_astrbot_loaded()
+    async def on_astrbot_loaded(self):
+        """AstrBot 加载完成 → 提示预渲染检查"""
+        self.warmer.trigger()
 
     async def terminate(self):
         """插件卸载时清理"""
-        try:
-            for f in self.data_dir.glob("temp_*"):
-                try:
-                    f.unlink()
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        await self.warmer.stop()
+        await self.renderer.metrics.stop_export(
+            self.data_dir / InternalCFG.METRICS_FILE
+        )
+        await self.renderer.shutdown()
+
+    def _fingerprint(self, mode: str) -> str:
+        # 该模式的高度表更新后需要按实测值重新分列，其版本号一并计入
+        registry = registry_fingerprint(self.context, self.config, self.prefixes)
+        return f"{registry}:{self.heights.version(mode)}"
+
+    async def _prerender(self, mode: str):
+        """预渲染静态菜单 (结果仅落入缓存)"""
+        # 预渲染本身就是刷新，不返回过期菜单
+        _, error = await self._render(mode, None, allow_stale=False)
+        if error:
+            logger.debug(f"[HelpTypst] 预渲染 {mode} 未产出图片: {error}")
+
+    async def _render(
+        self, mode: str, query: str | None, allow_stale: bool = True
+    ) -> tuple[RenderResult | None, str]:
+        """分析 → 布局 → 渲染"""
+        analyzer, title = self.views[mode]
+        # 注册表指纹：未变化时跳过分析与布局
+        fingerprint = self._fingerprint(mode)
+
+        def data_pipeline(timings: dict[str, float]) -> str | None:
+            """数据流转：全程内存，返回紧凑布局 JSON (分析 / 布局分别计时)"""
+            # 数据层：获取对象
+            with record_stage(timings, "analysis"):
+                plugins = analyzer.get_plugins(query, fingerprint)
+            if not plugins:
+                return None
+
+            # 视图层：决定标题 & 计算布局
+            display_title = f'搜索结果: "{query}"' if query else title
+            with record_stage(timings, "layout"):
+                return self.layout.dumps_layout(
+                    plugins=plugins,
+                    title=display_title,
+                    mode=mode,
+                    prefixes=self.prefixes,
+                    fingerprint=None if query else fingerprint,
+                )
+
+        return await self.renderer.render(
+            data_pipeline, mode, query, fingerprint, allow_stale=allow_stale
+        )
 
     async def _handle_request(
         self,
         event: AstrMessageEvent,
-        analyzer: BaseAnalyzer,
-        title: str,
         mode: str,
         query: str | None,
     ):
         """通用请求处理逻辑"""
-
-        def data_pipeline(save_path: Path) -> int:
-            """数据流转"""
-            # 数据层：获取对象
-            plugins = analyzer.get_plugins(query)
-            if not plugins:
-                return 0
-
-            # 视图层：决定标题 & 计算布局 & 写入JSON
-            display_title = f'搜索结果: "{query}"' if query else title
-            self.layout.dump_layout_json(
-                plugins=plugins,
-                save_path=save_path,
-                title=display_title,
-                mode=mode,
-                prefixes=self.prefixes,
-            )
-
-            return len(plugins)
-
-        result, error = await self.renderer.render(data_pipeline, mode, query)
+        result, error = await self._render(mode, query)
         if error:
             yield event.plain_result(error)
             return
@@ -100,8 +156,10 @@ class HelpTypst(Star):
         try:
             yield event.chain_result([Image.fromFileSystem(p) for p in result.images])
         finally:
-            if result.temp_files:
-                asyncio.create_task(self._cleanup_task(result.temp_files))
+            # 合并请求共享同一结果，只有最后一个发送完毕的请求负责清理
+            temp_files = result.release()
+            if temp_files:
+                asyncio.create_task(self._cleanup_task(temp_files))
 
     async def _cleanup_task(self, files: list[Path]):
         """异步清理任务"""
@@ -118,13 +176,7 @@ class HelpTypst(Star):
         """显示指令菜单"""
         if self.config.send_hint:
             yield event.plain_result("正在渲染帮助图...")
-        async for r in self._handle_request(
-            event,
-            analyzer=self.cmd_analyzer,
-            title="AstrBot 指令菜单",
-            mode="command",
-            query=query,
-        ):
+        async for r in self._handle_request(event, mode="command", query=query):
             yield r
 
     @filter.command("events")
@@ -132,13 +184,7 @@ class HelpTypst(Star):
         """显示事件监听列表"""
         if self.config.send_hint:
             yield event.plain_result("正在渲染事件监听图...")
-        async for r in self._handle_request(
-            event,
-            analyzer=self.evt_analyzer,
-            title="AstrBot 事件监听",
-            mode="event",
-            query=query,
-        ):
+        async for r in self._handle_request(event, mode="event", query=query):
             yield r
 
     @filter.command("filters")
@@ -146,11 +192,11 @@ class HelpTypst(Star):
         """显示过滤器详情"""
         if self.config.send_hint:
             yield event.plain_result("正在渲染过滤器详情图...")
-        async for r in self._handle_request(
-            event,
-            analyzer=self.flt_analyzer,
-            title="AstrBot 过滤器分析",
-            mode="filter",
-            query=query,
-        ):
+        async for r in self._handle_request(event, mode="filter", query=query):
             yield r
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("helps_stats")
+    async def show_stats(self, event: AstrMessageEvent):
+        """显示渲染统计 (分阶段耗时分位数 / 缓存命中)"""
+        yield event.plain_result(self.renderer.metrics.summary())
@@ -1,10 +1,39 @@
 // === 🔧 全局配置 ===
-#set page(width: 900pt, height: auto, margin: 20pt, fill: rgb("#f0f2f5"))
-#set text(font: ("Maple Mono NF"), size: 12pt)
-
 #let data = json.decode(sys.inputs.json_string)
 #let query_regex_str = sys.inputs.at("query_regex", default: none)
 #let generated_time = sys.inputs.at("timestamp", default: "Unknown Time")
+// 分页模式: 传入页高 (pt) 时按卡片边界自然分页，否则整张长图
+#let page_height = sys.inputs.at("page_height", default: none)
+#let paginated = page_height != none
+// 分片编译: sections 标记本片是否含页首/页尾，gap_before 为与上一片的间距 (pt)
+#let sections = data.at("sections", default: ("header", "footer"))
+#let has_header = "header" in sections
+#let has_footer = "footer" in sections
+
+#set page(
+  width: 900pt,
+  height: auto,
+  margin: (
+    x: 20pt,
+    top: if has_header { 20pt } else { data.at("gap_before", default: 0) * 1pt },
+    bottom: if has_footer { 20pt } else { 0pt },
+  ),
+  fill: rgb("#f0f2f5"),
+)
+#set text(font: ("Maple Mono NF"), size: 12pt)
+
+// 分页模式: 内容能放进一页时保持自适应页高，否则按固定页高分页
+// 依据上一轮布局中 <doc-end> 所在页判断 (Typst 迭代布局至收敛)，一次编译即可定夺，无需先光栅化整图
+#show: body => if paginated {
+  context {
+    let ends = query(<doc-end>)
+    let fits = ends.len() > 0 and ends.first().location().page() == 1
+    set page(height: if fits { auto } else { float(page_height) * 1pt })
+    body
+  }
+} else {
+  body
+}
 
 // === 🎨 调色板 ===
 
@@ -420,8 +449,9 @@
 
 // --- 插件卡片入口 ---
 #let plugin_card(plugin, mode: "standard") = {
+  // 分页模式下卡片可能高于一页，允许跨页断开，避免被裁切
   block(
-    width: 100%, breakable: false, radius: 8pt, inset: 12pt, 
+    width: 100%, breakable: paginated, radius: 8pt, inset: 12pt, 
     fill: white, stroke: 0.5pt + luma(220), 
   )[
     #plugin_header(plugin)
@@ -462,6 +492,15 @@
   ]
 }
 
+// --- 瀑布流卡片 (附实测高度) ---
+// 以 <card-height> 标记卡片 id (布局写入的内容摘要) 与实际尺寸 (pt)，渲染后回读，用于下次分列
+#let measured_card(plugin) = layout(size => {
+  let card = plugin_card(plugin, mode: "standard")
+  let height = measure(card, width: size.width).height
+  [#metadata((id: plugin.at("card_id", default: none), width: size.width.pt(), height: height.pt()))<card-height>]
+  card
+})
+
 // --- 独立指令区 ---
 #let render_singles_section(singles) = {
   if singles.len() > 0 {
@@ -525,46 +564,79 @@
   }
 }
 
+// --- 页脚 ---
+#let render_footer() = [
+  #v(20pt)
+  // 分页模式下不贴底，便于裁掉末页空白
+  #align(if paginated { center } else { center + bottom })[
+    #text(size: 10pt, fill: silver)[Powered by AstrBot & Typst Engine]
+  ]
+]
+
 // === 🏭 组装视图 ===
 
 // --- 主布局 ---
-#align(center)[
-  #block(inset: (top: 20pt, bottom: 5pt))[
-    #text(size: 36pt, weight: "black", fill: c_text_primary)[#data.title] \
-    #v(6pt)
-    #text(size: 11pt, fill: c_desc_text)[
-      已加载 #data.plugin_count 个插件/监听组  ·  #generated_time
+#if has_header [
+  #align(center)[
+    #block(inset: (top: 20pt, bottom: 5pt))[
+      #text(size: 36pt, weight: "black", fill: c_text_primary)[#data.title] \
+      #v(6pt)
+      #text(size: 11pt, fill: c_desc_text)[
+        已加载 #data.plugin_count 个插件/监听组  ·  #generated_time
+      ]
     ]
   ]
-]
 
-// 语法指引
-#if data.at("mode", default: "command") == "command" {
-  render_syntax_guide()
-} else {
-  v(15pt) // 如果不是指令模式，补回一点间距
-}
+  // 语法指引
+  #if data.at("mode", default: "command") == "command" {
+    render_syntax_guide()
+  } else {
+    v(15pt) // 如果不是指令模式，补回一点间距
+  }
+]
 
 // --- 巨型块 --- 
 #if data.giants.len() > 0 {
   stack(spacing: 10pt, ..data.giants.map(plugin => plugin_card(plugin, mode: "giant")))
+  // 仅含巨型块的分片不带尾部间距，由后续分片补上
+  if data.columns.len() > 0 { v(15pt) }
+} else if data.at("after_giants", default: false) {
+  // 零高度占位块复现 巨型块 → 间距 → 瀑布流 的块间距
+  block(height: 0pt)
   v(15pt)
 }
 
 // --- Columns ---
-#grid(
-  columns: (1fr, 1fr, 1fr), gutter: 15pt,
-  ..data.columns.map(col_plugins => {
-    align(top)[
-      #stack(spacing: 10pt, ..col_plugins.map(plugin => plugin_card(plugin, mode: "standard")))
-    ]
-  })
-)
+#if data.columns.len() > 0 {
+  // 列数由布局决定 (瀑布流列数配置)
+  grid(
+    columns: (1fr,) * data.columns.len(), gutter: 15pt,
+    ..data.columns.map(col_plugins => {
+      align(top)[
+        #stack(spacing: 10pt, ..col_plugins.map(plugin => measured_card(plugin)))
+      ]
+    })
+  )
+}
 
 // --- Singles ---
 #render_singles_section(data.singles)
 
-#v(20pt)
-#align(center + bottom)[
-  #text(size: 10pt, fill: silver)[Powered by AstrBot & Typst Engine]
-]
\ No newline at end of file
+#if has_footer { render_footer() }
+
+#metadata(none)<doc-end>
+
+// --- 片段模式 ---
+// 每张卡片单独成页 (页宽即卡片宽)，由外部缓存后拼接；末页为独立指令区 + 页脚
+#let fragments = data.at("fragments", default: none)
+#if fragments != none {
+  for f in fragments.cards {
+    page(width: f.width * 1pt, height: auto, margin: 0pt)[
+      #if f.kind == "standard" { measured_card(f.plugin) } else { plugin_card(f.plugin, mode: f.kind) }
+    ]
+  }
+  page(height: auto, margin: (x: 20pt, top: 0pt, bottom: 20pt))[
+    #render_singles_section(fragments.singles)
+    #render_footer()
+  ]
+}
\ No newline at end of file
@@ -1,12 +1,27 @@
+from .atomic import atomic_write
 from .config import PluginConfig
+from .filelock import FileLock
 from .hash import calculate_hash
-from .image import process_image_to_webp, verify_image_header
+from .heights import CardHeights
+from .image import (
+    composite_cards,
+    process_image_to_webp,
+    process_pages_to_webp,
+    stitch_vertical,
+    verify_image_header,
+)
 from .view import TypstLayout
 
 __all__ = [
     "PluginConfig",
     "TypstLayout",
+    "CardHeights",
+    "FileLock",
+    "atomic_write",
     "calculate_hash",
     "verify_image_header",
     "process_image_to_webp",
+    "process_pages_to_webp",
+    "stitch_vertical",
+    "composite_cards",
 ]
@@ -0,0 +1,22 @@
+import os
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_write(path: Path) -> Iterator[Path]:
+    """原子写入：产出临时文件路径，写完后改名为目标文件
+
+    读者要么看到旧文件，要么看到完整的新文件；临时文件名带 pid 与随机后缀，
+    同一进程的多个线程、共享 data_dir 的多个实例并发写同一目标互不干扰。
+    写入失败时删除临时文件。
+    """
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
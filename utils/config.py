@@ -13,12 +13,28 @@ class PluginConfig:
     max_concurrent_tasks: int
     ppi: float
     giant_threshold: int
+    column_count: int
     split_height: int
     webp_limit: int
+    webp_quality: int
+    webp_method: int
+    webp_lossless: bool
+    paginate: bool
+    shard_compile: bool
+    fragment_cache: bool
+    serve_stale: bool
+    max_stale: int
+    search_cache_entries: int
+    search_cache_mb: int
+    cache_store: str
+    cache_store_uri: str
+    cache_store_ttl: int
+    cache_store_mb: int
 
     # ===== other =====
     ignored_plugins: list[str]
     send_hint: bool
+    prerender: bool
 
     @classmethod
     def load(cls, raw_cfg: AstrBotConfig) -> "PluginConfig":
@@ -26,4 +42,5 @@ class PluginConfig:
             **raw_cfg["rendering"],
             ignored_plugins=raw_cfg["ignored_plugins"],
             send_hint=raw_cfg["send_hint"],
+            prerender=raw_cfg["prerender"],
         )
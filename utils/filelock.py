@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """跨进程文件锁 (POSIX: fcntl.flock / Windows: msvcrt.locking)
+
+    用于共享 data_dir 的多个 AstrBot 实例之间互斥；同一对象不可重入。
+    获取锁采用非阻塞轮询，异步等待可被取消而不会遗留持有中的锁。
+    """
+
+    POLL_INTERVAL: float = 0.05
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def try_acquire(self) -> bool:
+        """尝试获取锁，已被其他进程持有时立即返回 False"""
+        if self._fd is not None:
+            raise RuntimeError(f"锁已被当前对象持有: {self.path}")
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def acquire(self):
+        """阻塞获取 (供线程中的同步代码使用)"""
+        while not self.try_acquire():
+            time.sleep(self.POLL_INTERVAL)
+
+    async def acquire_async(self):
+        """异步获取：等待期间不占用事件循环"""
+        while not self.try_acquire():
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
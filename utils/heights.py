@@ -0,0 +1,108 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+from .atomic import atomic_write
+from .hash import calculate_hash
+
+
+class CardHeights:
+    """瀑布流卡片实测高度表 (pt)
+
+    渲染后由 Typst 回读各卡片的实际高度，按卡片内容摘要持久化
+    (同名卡片如事件分组各自独立；内容变化即换新条目，布局退回估算)；
+    条目附带列宽，列宽变化同样视为失效。
+    读取无锁 (整表替换)；update / save 可能来自多个渲染线程，串行执行。
+    """
+
+    # 高度变化小于该值 (pt) 不算更新，避免浮点抖动触发重排
+    TOLERANCE = 0.5
+
+    # 表项上限：插件变动后旧摘要不再被引用，超出时淘汰最早登记的条目
+    MAX_ENTRIES = 4096
+
+    # 表结构版本 (旧版按插件名登记的表直接作废)
+    FORMAT = 2
+
+    def __init__(self, path: Path, template_path: Path):
+        self.path = path
+        # 模板改动会改变卡片高度，整表随之失效
+        self._template = calculate_hash(template_path.read_text(encoding="utf-8"))
+        self._table: dict[str, dict[str, Any]] = self._load()
+        self._lock = threading.Lock()
+        # 各菜单模式的表版本：该模式回读到新高度时 +1，布局记忆化据此判断是否需要重排
+        # (按模式区分，一个菜单的实测不会让其他菜单重新分列 / 重新渲染)
+        self._versions: dict[str, int] = {}
+
+    @staticmethod
+    def digest(plugin: dict[str, Any]) -> str:
+        """卡片内容摘要 (与布局 JSON 中的插件字典一致)，即卡片 id"""
+        return calculate_hash(
+            json.dumps(plugin, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        )
+
+    def get(self, card_id: str, width: float) -> float | None:
+        entry = self._table.get(card_id)
+        if entry and abs(entry["width"] - width) < self.TOLERANCE:
+            return entry["height"]
+        return None
+
+    def version(self, mode: str) -> int:
+        return self._versions.get(mode, 0)
+
+    def update(self, measured: list[dict], mode: str) -> bool:
+        """登记实测高度，返回是否有新增/变化的条目
+
+        measured: Typst 回读的 [{id, width, height}]，id 为布局写入的卡片摘要
+        mode: 回读来源的菜单模式，仅该模式的版本递增
+        """
+        with self._lock:
+            table = dict(self._table)
+            changed = False
+            for m in measured:
+                card_id = m.get("id")
+                if not card_id:
+                    continue
+                entry = table.get(card_id)
+                if (
+                    entry
+                    and abs(entry["width"] - m["width"]) < self.TOLERANCE
+                    and abs(entry["height"] - m["height"]) < self.TOLERANCE
+                ):
+                    continue
+                table.pop(card_id, None)
+                table[card_id] = {"width": m["width"], "height": m["height"]}
+                changed = True
+
+            if changed:
+                while len(table) > self.MAX_ENTRIES:
+                    del table[next(iter(table))]
+                # 整表替换，布局线程读到的总是完整快照
+                self._table = table
+                self._versions[mode] = self.version(mode) + 1
+        return changed
+
+    def save(self):
+        """写入磁盘 (先写临时文件再改名)"""
+        with self._lock:
+            data = {
+                "format": self.FORMAT,
+                "template": self._template,
+                "cards": self._table,
+            }
+            with atomic_write(self.path) as tmp:
+                tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != self.FORMAT
+            or data.get("template") != self._template
+        ):
+            return {}
+        return data.get("cards", {})
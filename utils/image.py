@@ -1,7 +1,13 @@
+import io
 import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
-from PIL import Image
+from PIL import Image, ImageChops
+
+from .atomic import atomic_write
 
 
 def verify_image_header(path: Path) -> bool:
@@ -14,44 +20,245 @@ def verify_image_header(path: Path) -> bool:
         return False
 
 
+def _save_webp(img: Image.Image, path: Path, quality: int, method: int, lossless: bool):
+    # 先写临时文件再改名：共享目录的其他实例不会读到半截文件
+    with atomic_write(path) as tmp:
+        img.save(tmp, "WEBP", quality=quality, method=method, lossless=lossless)
+
+
+def _save_webp_chunk(
+    img: Image.Image,
+    box: tuple[int, int, int, int],
+    path: Path,
+    quality: int,
+    method: int,
+    lossless: bool,
+):
+    # 在线程内裁剪，同一时刻只有 worker 数量的分片驻留内存
+    _save_webp(img.crop(box), path, quality, method, lossless)
+
+
+def stitch_vertical(parts: list[bytes]) -> Image.Image:
+    """把多段 PNG 字节按顺序纵向拼接为一张图 (宽度取最大值)"""
+    images = [Image.open(io.BytesIO(p)) for p in parts]
+    try:
+        width = max(img.width for img in images)
+        canvas = Image.new("RGB", (width, sum(img.height for img in images)))
+        top = 0
+        for img in images:
+            canvas.paste(img.convert("RGB"), (0, top))
+            top += img.height
+        return canvas
+    finally:
+        for img in images:
+            img.close()
+
+
+def composite_cards(
+    header: bytes,
+    giants: list[Path],
+    columns: list[list[Path]],
+    tail: bytes,
+    margin: int,
+    column_pitch: float,
+    card_gap: int,
+    section_gap: int,
+    block_spacing: int,
+) -> Image.Image:
+    """按模板布局把卡片片段拼成整张菜单
+
+    header / tail: 页首、页尾 (独立指令区 + 页脚) 的 PNG 字节
+    giants: 巨型卡片 PNG 路径，整宽纵向排列
+    columns: 瀑布流各列的卡片 PNG 路径；第 i 列左边缘位于 margin + i * column_pitch
+    block_spacing: Typst 块间距；巨型块之后的间距与模板流式布局一致
+        (v(15pt) + 瀑布流网格，网格为空时其块间距仍然保留)
+    """
+    head_img = Image.open(io.BytesIO(header)).convert("RGB")
+    tail_img = Image.open(io.BytesIO(tail)).convert("RGB")
+    # 背景色取页首左上角，与模板页面底色一致
+    bg = head_img.getpixel((0, 0))
+
+    def stack_height(paths: list[Path]) -> int:
+        # Image.open 只读文件头，取尺寸开销很小
+        heights = []
+        for p in paths:
+            with Image.open(p) as img:
+                heights.append(img.height)
+        return sum(heights) + card_gap * max(0, len(heights) - 1)
+
+    giants_h = stack_height(giants)
+    columns_h = max((stack_height(col) for col in columns), default=0)
+    after_giants = section_gap + block_spacing
+    tail_gap = section_gap if columns_h or not giants else after_giants + block_spacing
+
+    height = head_img.height + tail_gap + tail_img.height
+    if giants:
+        height += section_gap + giants_h
+    if columns_h:
+        height += (after_giants if giants else section_gap) + columns_h
+
+    canvas = Image.new("RGB", (head_img.width, height), bg)
+    canvas.paste(head_img, (0, 0))
+    y = head_img.height
+
+    def paste_stack(paths: list[Path], x: int, top: int):
+        for p in paths:
+            with Image.open(p) as img:
+                canvas.paste(img.convert("RGB"), (x, top))
+                top += img.height + card_gap
+
+    if giants:
+        y += section_gap
+        paste_stack(giants, margin, y)
+        y += giants_h
+    if columns_h:
+        y += after_giants if giants else section_gap
+        for i, col in enumerate(columns):
+            paste_stack(col, margin + round(i * column_pitch), y)
+        y += columns_h
+
+    canvas.paste(tail_img, (0, y + tail_gap))
+    head_img.close()
+    tail_img.close()
+    return canvas
+
+
 def process_image_to_webp(
-    source_path: str,
+    source: str | bytes | Image.Image,
     output_dir: str,
     stem_name: str,
     webp_limit: int,
     split_height: int,
+    quality: int = 80,
+    method: int = 6,
+    lossless: bool = False,
+    workers: int | None = None,
 ) -> list[str]:
-    """核心图片处理逻辑"""
+    """核心图片处理逻辑
+
+    source: PNG 文件路径、内存中的 PNG 字节，或已解码的图片
+    quality / method / lossless: WebP 编码参数 (method 0 最快，6 最慢但最小)
+    workers: 分片编码线程数，默认取 CPU 核数 (进程池内由调用方按 worker 数均分)
+    """
     images = []
-    src_path_obj = Path(source_path)
     out_dir_obj = Path(output_dir)
 
-    if not src_path_obj.exists():
+    if isinstance(source, (str, Path)) and not Path(source).exists():
         return []
     try:
-        with Image.open(src_path_obj) as img:
+        if isinstance(source, Image.Image):
+            opened = nullcontext(source)
+        elif isinstance(source, bytes):
+            opened = Image.open(io.BytesIO(source))
+        else:
+            opened = Image.open(source)
+        with opened as img:
             if img.height <= webp_limit:
                 # 不切分
                 webp_path = out_dir_obj / f"{stem_name}.webp"
-                img.save(webp_path, "WEBP", quality=80, method=6)
+                _save_webp(img, webp_path, quality, method, lossless)
                 images.append(str(webp_path))
             else:
-                # 切分
+                # 切分：Pillow 编码时释放 GIL，分片并行编码
+                img.load()
                 width, total_height = img.size
                 chunks = math.ceil(total_height / split_height)
+                jobs = []
                 for i in range(chunks):
                     top = i * split_height
                     bottom = min((i + 1) * split_height, total_height)
 
                     box = (0, top, width, bottom)
-                    chunk = img.crop(box)
-
                     chunk_path = out_dir_obj / f"{stem_name}_part{i + 1}.webp"
-                    chunk.save(chunk_path, "WEBP", quality=80, method=6)
+                    jobs.append((box, chunk_path))
                     images.append(str(chunk_path))
 
+                n_workers = min(chunks, workers or os.cpu_count() or 1)
+                with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                    futures = [
+                        pool.submit(
+                            _save_webp_chunk, img, box, path, quality, method, lossless
+                        )
+                        for box, path in jobs
+                    ]
+                    for f in futures:
+                        f.result()
+
     except Exception as e:
         # 抛出异常让上层捕获
         raise RuntimeError(f"图片处理失败: {e}")
 
     return images
+
+
+def _trim_bottom(img: Image.Image, margin: int) -> Image.Image:
+    """裁掉页面底部的纯背景区域，保留 margin 像素留白"""
+    # RGBA 的 getbbox 只看 alpha 通道，统一按 RGB 比较
+    rgb = img.convert("RGB")
+    bg = Image.new("RGB", rgb.size, rgb.getpixel((0, rgb.height - 1)))
+    bbox = ImageChops.difference(rgb, bg).getbbox()
+    if not bbox:
+        return img
+    bottom = min(img.height, bbox[3] + margin)
+    return img.crop((0, 0, img.width, bottom)) if bottom < img.height else img
+
+
+def _encode_page(
+    page: bytes,
+    path: Path,
+    trim_margin: int | None,
+    quality: int,
+    method: int,
+    lossless: bool,
+):
+    with Image.open(io.BytesIO(page)) as img:
+        if trim_margin is not None:
+            img.load()
+            img = _trim_bottom(img, trim_margin)
+        _save_webp(img, path, quality, method, lossless)
+
+
+def process_pages_to_webp(
+    pages: list[bytes],
+    output_dir: str,
+    stem_name: str,
+    trim_margin: int,
+    quality: int = 80,
+    method: int = 6,
+    lossless: bool = False,
+    workers: int | None = None,
+) -> list[str]:
+    """分页模式：每页 PNG 字节各自编码为一张 WebP
+
+    页高已由模板按卡片边界控制，无需再切分；末页裁掉底部空白。
+    """
+    out_dir_obj = Path(output_dir)
+    if len(pages) == 1:
+        images = [str(out_dir_obj / f"{stem_name}.webp")]
+    else:
+        images = [
+            str(out_dir_obj / f"{stem_name}_part{i + 1}.webp")
+            for i in range(len(pages))
+        ]
+    last = len(pages) - 1
+    try:
+        n_workers = min(len(pages), workers or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(
+                    _encode_page,
+                    page,
+                    Path(path),
+                    trim_margin if i == last else None,
+                    quality,
+                    method,
+                    lossless,
+                )
+                for i, (page, path) in enumerate(zip(pages, images))
+            ]
+            for f in futures:
+                f.result()
+    except Exception as e:
+        raise RuntimeError(f"图片处理失败: {e}")
+
+    return images
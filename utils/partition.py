@@ -0,0 +1,67 @@
+def lpt_partition(weights: list[float], k: int) -> list[list[int]]:
+    """最长处理时间优先 (LPT)：按权重降序，依次放入当前最矮的列
+
+    返回每列的下标列表 (列内按权重降序)
+    """
+    columns: list[list[int]] = [[] for _ in range(k)]
+    loads = [0.0] * k
+    for i in sorted(range(len(weights)), key=lambda i: weights[i], reverse=True):
+        idx = loads.index(min(loads))
+        columns[idx].append(i)
+        loads[idx] += weights[i]
+    return columns
+
+
+def refine_partition(
+    weights: list[float], columns: list[list[int]], max_rounds: int = 200
+) -> list[list[int]]:
+    """局部搜索：反复在最高列与其他列之间移动/交换单个元素，直到无法再压低两列中的较高者
+
+    每一步都严格降低 (最高列, 对方列) 中的较大值，其余列不变，因此必然收敛；
+    max_rounds 仅作为保险上限。
+    """
+    columns = [list(col) for col in columns]
+    loads = [sum(weights[i] for i in col) for col in columns]
+
+    for _ in range(max_rounds):
+        hi = loads.index(max(loads))
+        best: tuple[float, int, int | None, int | None] | None = None
+
+        for lo in range(len(columns)):
+            if lo == hi:
+                continue
+            # 移动: hi 中的 a → lo
+            for a in columns[hi]:
+                w = weights[a]
+                peak = max(loads[hi] - w, loads[lo] + w)
+                if peak < loads[hi] and (best is None or peak < best[0]):
+                    best = (peak, lo, a, None)
+            # 交换: hi 中的 a ⇄ lo 中的 b
+            for a in columns[hi]:
+                for b in columns[lo]:
+                    d = weights[a] - weights[b]
+                    if d <= 0:
+                        continue
+                    peak = max(loads[hi] - d, loads[lo] + d)
+                    if peak < loads[hi] and (best is None or peak < best[0]):
+                        best = (peak, lo, a, b)
+
+        if best is None:
+            break
+        _, lo, a, b = best
+        columns[hi].remove(a)
+        columns[lo].append(a)
+        loads[hi] -= weights[a]
+        loads[lo] += weights[a]
+        if b is not None:
+            columns[lo].remove(b)
+            columns[hi].append(b)
+            loads[lo] -= weights[b]
+            loads[hi] += weights[b]
+
+    # 列内保持高卡片在上
+    return [sorted(col, key=lambda i: weights[i], reverse=True) for col in columns]
+
+
+def max_load(weights: list[float], columns: list[list[int]]) -> float:
+    return max((sum(weights[i] for i in col) for col in columns), default=0.0)
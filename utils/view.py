@@ -1,35 +1,110 @@
 import json
 import math
-from pathlib import Path
 from typing import Any
 
-from ..domain import PluginMetadata, RenderNode
+from astrbot.api import logger
+
+from ..domain import InternalCFG, LiteNode, LitePlugin
 from . import PluginConfig
+from .heights import CardHeights
+from .partition import lpt_partition, max_load, refine_partition
 
 
 class TypstLayout:
     """负责将结构化数据转换为 Typst 渲染所需的布局 JSON"""
 
-    def __init__(self, config: PluginConfig):
+    def __init__(self, config: PluginConfig, heights: CardHeights | None = None):
         self.cfg = config
-
-    def dump_layout_json(
+        # 卡片实测高度表 (缺省时全部使用估算)
+        self.heights = heights
+        # 静态菜单布局记忆化: mode → (指纹, 标题, 高度表版本, JSON 文本)
+        self._memo: dict[str, tuple[str, str, int, str]] = {}
+        # 最近一次分列结果: mode → (LPT 最高列, 优化后最高列) (pt)
+        self.column_stats: dict[str, tuple[float, float]] = {}
+
+    def dumps_layout(
         self,
-        plugins: list[PluginMetadata],
-        save_path: Path,
+        plugins: list[LitePlugin],
         title: str,
         mode: str,
         prefixes: list[str],
-    ):
-        """生成布局数据并写入文件"""
+        fingerprint: str | None = None,
+    ) -> str:
+        """生成紧凑布局 JSON (传入指纹时，指纹不变则直接复用上次结果)"""
+        # 实测高度更新后需要重新分列
+        version = self.heights.version(mode) if self.heights else 0
+        memo = self._memo.get(mode)
+        if fingerprint and memo and memo[:3] == (fingerprint, title, version):
+            return memo[3]
+
         payload = self._generate_balanced_payload(plugins, title, mode, prefixes)
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        if fingerprint:
+            self._memo[mode] = (fingerprint, title, version, text)
+        return text
+
+    @staticmethod
+    def column_width(n_cols: int) -> float:
+        """瀑布流单列宽度 (pt)，与模板的页宽/边距/列间距一致"""
+        width = InternalCFG.PAGE_WIDTH_PT - 2 * InternalCFG.PAGE_MARGIN_PT
+        return (width - (n_cols - 1) * InternalCFG.COLUMN_GUTTER_PT) / n_cols
+
+    @staticmethod
+    def shard_layout(text: str, max_shards: int) -> list[str]:
+        """把布局 JSON 拆成可并行编译的分片，按顺序纵向拼接即为完整菜单
+
+        - 仅当存在巨型块时拆分 (Event/Filter 大菜单的主要耗时)
+        - 巨型块按节点数连续分组；瀑布流 + 独立指令区合为最后一片
+        - 页首随第一片，页尾随最后一片
+        """
+        payload = json.loads(text)
+        giants = payload["giants"]
+        has_tail = any(payload["columns"]) or bool(payload["singles"])
+        groups = min(len(giants), max_shards - 1 if has_tail else max_shards)
+        if groups < 1 or groups + has_tail < 2:
+            return [text]
+
+        # 巨型块连续分组，使各组节点数接近
+        weights = [TypstLayout._count_nodes(g.get("nodes", [])) + 1 for g in giants]
+        target = sum(weights) / groups
+        chunks, current, acc = [], [], 0
+        for i, (giant, w) in enumerate(zip(giants, weights)):
+            left = len(giants) - i  # 含当前块
+            need = groups - len(chunks) - 1  # 当前组之后还需开几组
+            if current and need > 0 and (acc + w / 2 > target or left <= need):
+                chunks.append(current)
+                current, acc = [], 0
+            current.append(giant)
+            acc += w
+        chunks.append(current)
+
+        shards = [{**payload, "giants": c, "columns": [], "singles": []} for c in chunks]
+        if has_tail:
+            shards.append({**payload, "giants": [], "after_giants": True})
+        else:
+            shards[-1].update(columns=payload["columns"], singles=payload["singles"])
+
+        for i, shard in enumerate(shards):
+            sections = []
+            if i == 0:
+                sections.append("header")
+            elif shard["giants"]:
+                shard["gap_before"] = 10  # 巨型块之间的间距
+            if i == len(shards) - 1:
+                sections.append("footer")
+            shard["sections"] = sections
+
+        return [
+            json.dumps(shard, ensure_ascii=False, separators=(",", ":"))
+            for shard in shards
+        ]
 
-        save_path.write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+    @staticmethod
+    def _count_nodes(nodes: list[dict[str, Any]]) -> int:
+        return sum(1 + TypstLayout._count_nodes(n.get("children") or []) for n in nodes)
 
     def _generate_balanced_payload(
-        self, plugins: list[PluginMetadata], title: str, mode: str, prefixes: list[str]
+        self, plugins: list[LitePlugin], title: str, mode: str, prefixes: list[str]
     ) -> dict[str, Any]:
         """瀑布流分发逻辑"""
         giants = []
@@ -37,7 +112,7 @@ class TypstLayout:
         single_node_plugins = []
 
         # 辅助函数：获取节点列表
-        def get_nodes(p: PluginMetadata) -> list[RenderNode]:
+        def get_nodes(p: LitePlugin) -> list[LiteNode]:
             if hasattr(p, "nodes") and p.nodes:
                 return p.nodes
             if hasattr(p, "command_nodes") and p.command_nodes: # type: ignore
@@ -55,12 +130,12 @@ class TypstLayout:
                 nodes[0].tag == "tool" or nodes[0].tag == "mcp"
             )
             if is_tool:
-                single_node_plugins.append(p.model_dump())
+                single_node_plugins.append(p.to_dict())
                 continue
 
             # B: 单指令 -> Singles (Command 模式)
             if extract_singles and len(nodes) == 1 and not nodes[0].is_group:
-                single_node_plugins.append(p.model_dump())
+                single_node_plugins.append(p.to_dict())
                 continue
 
             # C: 巨型块 -> Giants (Event/Filter 模式)
@@ -69,28 +144,37 @@ class TypstLayout:
                 mode in ("event", "filter")
                 and h_val > self.cfg.giant_threshold
             ):
-                giants.append(p.model_dump())
+                giants.append(p.to_dict())
                 continue
 
             # D: 其余 -> 瀑布流
             complex_plugins.append(p)
 
         # 2. 瀑布流平衡算法
-        # 计算高度权重 (+80 是对卡片头部和Padding的估算)
-        plugins_with_height = [
-            (p, self._estimate_height(get_nodes(p)) + 80) for p in complex_plugins
-        ]
-        # 降序排列 (贪心算法基础)
-        sorted_plugins = sorted(plugins_with_height, key=lambda x: x[1], reverse=True)
-
-        cols_data = [[] for _ in range(3)]
-        col_heights = [0] * 3
-
-        for plugin, height in sorted_plugins:
-            # 放入当前高度最小的列
-            idx = col_heights.index(min(col_heights))
-            cols_data[idx].append(plugin.model_dump())
-            col_heights[idx] += height
+        n_cols = self.cfg.column_count
+        plugins_with_height = self._card_heights(
+            [p.to_dict() for p in complex_plugins],
+            # +80 是对卡片头部和Padding的估算
+            [self._estimate_height(get_nodes(p)) + 80 for p in complex_plugins],
+            self.column_width(n_cols),
+        )
+        # 每张卡片占用 卡片高度 + 卡片间距，列高 = 合计 - 一个间距
+        gap = InternalCFG.CARD_GAP_PT
+        weights = [h + gap for _, h in plugins_with_height]
+
+        # LPT 贪心得到初始解，再用局部搜索压低最高列
+        initial = lpt_partition(weights, n_cols)
+        columns = refine_partition(weights, initial)
+        cols_data = [[plugins_with_height[i][0] for i in col] for col in columns]
+
+        if complex_plugins:
+            before = max_load(weights, initial) - gap
+            after = max_load(weights, columns) - gap
+            self.column_stats[mode] = (before, after)
+            logger.debug(
+                f"[HelpTypst] 瀑布流分列 ({mode}): {n_cols} 列, 最高列 {after:.0f}pt "
+                f"(LPT {before:.0f}pt, 节省 {(before - after) * self.cfg.ppi / 72:.0f}px)"
+            )
 
         return {
             "title": title,
@@ -102,7 +186,29 @@ class TypstLayout:
             "singles": single_node_plugins,
         }
 
-    def _estimate_height(self, nodes: list[RenderNode]) -> int:
+    def _card_heights(
+        self, plugins: list[dict[str, Any]], estimates: list[int], width: float
+    ) -> list[tuple[dict[str, Any], float]]:
+        """卡片高度：优先取实测值，未测过的卡片用估算值
+
+        估算值按已测卡片的 实测/估算 比例校准，使两者可以放在同一列里比较；
+        每张卡片写入 card_id (内容摘要)，模板随实测值一并回传
+        """
+        if not self.heights:
+            return list(zip(plugins, estimates))
+
+        measured = []
+        for p in plugins:
+            p["card_id"] = CardHeights.digest(p)
+            measured.append(self.heights.get(p["card_id"], width))
+        known = [(m, e) for m, e in zip(measured, estimates) if m is not None]
+        scale = sum(m for m, _ in known) / sum(e for _, e in known) if known else 1.0
+        return [
+            (p, m if m is not None else e * scale)
+            for p, m, e in zip(plugins, measured, estimates)
+        ]
+
+    def _estimate_height(self, nodes: list[LiteNode]) -> int:
         """高度估算器(暂硬编码，等待完善模板逻辑)"""
         total_h = 0
         complex_nodes = [n for n in nodes if n.is_group or n.desc != ""]